@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the webservice end to end, against local stand-ins of the devices and the external apis.
+
+The server is started with ``src/webservice/server.py --production``, the cameras read generated videos,
+the gps replays a generated NMEA log and google maps, google places, accuweather, spotify and wikipedia
+are served by ``src.benchmark.stubs``. Every route is measured after a few warm-up calls, then the full
+runner tick, and the results are written as json in ``reports/benchmarks``.
+
+Usage: ``python src/benchmark/run_benchmark.py --requests 200 --concurrency 4``
+"""
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import datetime
+import subprocess
+import collections
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+project_dir = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(project_dir))
+
+from src import settings
+from src.benchmark import stubs
+from src.webservice.client import WebserviceClient
+
+REPORT_PATH = os.path.join(project_dir, "reports", "benchmarks")
+
+Route = collections.namedtuple("Route", ["blueprint", "name", "method", "path", "request"])
+
+
+def routes(points, frames):
+    """Routes of every blueprint and how to call them.
+
+    /api/features/get_lat_lon_time only reads a local json file and is not measured.
+
+    :param points: (list) latitude, longitude of the route, the calls go through them
+    :param frames: (dict) face & front jpeg
+    :return: (list) Route
+    """
+    def position(index):
+        lat, lng = points[index % len(points)]
+        return {"json": {"latitude": lat, "longitude": lng}}
+
+    def image(name):
+        return lambda index: {"data": frames[name], "headers": {"content-type": "image/jpeg"}}
+
+    def payload(data):
+        return lambda index: {"json": data}
+
+    def tick(index):
+        lat, lng = points[index % len(points)]
+        files = {"face": ("face.jpg", frames["face"], "image/jpeg"), "front": ("front.jpg", frames["front"], "image/jpeg")}
+        return {"data": {"latitude": lat, "longitude": lng}, "files": files}
+
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    day_time = {
+        "now_time": now.isoformat() + "+00:00",
+        "sunrise_time": now.replace(hour=7, minute=0, second=0).isoformat() + "+00:00",
+        "sunset_time": now.replace(hour=18, minute=0, second=0).isoformat() + "+00:00"
+    }
+    music_params = {
+        "target_acousticness": 0.5, "target_danceability": 0.5, "target_energy": 0.5,
+        "min_tempo": 80, "country": "FR", "target_valence": 0.5, "seed_genres": ["french"]
+    }
+    features = [
+        "get_weather_from_latlon", "get_ratio_mask_from_latlon", "get_song_from_latlon",
+        "get_sun_position_from_latlon", "get_all_poi_from_latlon", "get_interesting_poi_information_from_latlon"
+    ]
+
+    return [Route("features", name, "POST", f"features/{name}", position) for name in features] + [
+        Route("landscape", "get_landscape_from_image", "POST", "landscape/get_landscape_from_image", image("front")),
+        Route("landscape", "get_landscapes_from_images", "POST", "landscape/get_landscapes_from_images",
+              lambda index: {"files": [("images", ("front.jpg", frames["front"], "image/jpeg"))] * 4}),
+        Route("mood", "get_mood_from_image", "POST", "mood/get_mood_from_image", image("face")),
+        Route("face", "get_face_from_image", "POST", "face/get_face_from_image", image("face")),
+        Route("face", "get_face_analysis_from_image", "POST", "face/get_face_analysis_from_image", image("face")),
+        Route("frame", "get_camera_face", "GET", "frame/get_camera_face", lambda index: {}),
+        Route("frame", "get_camera_front", "GET", "frame/get_camera_front", lambda index: {}),
+        Route("music", "get_params", "GET", "music/get_params", lambda index: {}),
+        Route("music", "get_recommendations", "POST", "music/get_recommendations", payload(music_params)),
+        Route("music", "get_combined_params", "POST", "music/get_combined_params",
+              payload({"conditions": {"meteo": "sunny", "day/night": "afternoon", "mood": "happy"}, "speed": 50})),
+        Route("music", "get_day_time", "POST", "music/get_day_time", payload(day_time)),
+        Route("music", "get_driver_preferences", "POST", "music/get_driver_preferences", payload("adam")),
+        Route("music", "get_speed_energy", "POST", "music/get_speed_energy", payload({"speed": 50})),
+        Route("music", "get_mood", "POST", "music/get_mood", payload({"mood": "happy"})),
+        Route("gps", "get_latlon", "GET", "gps/get_latlon", lambda index: {}),
+        Route("gps", "get_speed", "GET", "gps/get_speed", lambda index: {}),
+        Route("gps", "get_fix", "GET", "gps/get_fix", lambda index: {}),
+        Route("tick", "tick", "POST", "tick", tick),
+    ]
+
+
+def summarize(latencies, duration, errors):
+    """Latency percentiles and throughput of a series of calls.
+
+    :param latencies: (list) seconds of each successful call
+    :param duration: (float) wall time of the series in seconds
+    :param errors: (int) number of failed calls
+    :return: (dict) statistics, the latencies in milliseconds
+    """
+    summary = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round((len(latencies) + errors) / duration, 3) if duration else None
+    }
+    if latencies:
+        milliseconds = 1000 * np.asarray(latencies)
+        p50, p95, p99 = np.percentile(milliseconds, [50, 95, 99])
+        summary.update({
+            "p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(milliseconds.mean()), 3), "max_ms": round(float(milliseconds.max()), 3)
+        })
+
+    return summary
+
+
+def measure(call, count, concurrency, warm_up):
+    """Call a function repeatedly and measure it.
+
+    :param call: (callable) takes the index of the call, returns True on success
+    :param count: (int) number of measured calls
+    :param concurrency: (int) number of concurrent callers
+    :param warm_up: (int) number of calls made before measuring
+    :return: (dict) statistics
+    """
+    for index in range(warm_up):
+        call(index)
+
+    def timed_call(index):
+        start = time.perf_counter()
+        try:
+            success = call(index)
+        except Exception:
+            success = False
+        return success, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed_call, range(warm_up, warm_up + count)))
+    duration = time.perf_counter() - start
+
+    return summarize([elapsed for success, elapsed in results if success], duration,
+                     sum(not success for success, _ in results))
+
+
+class Benchmark(object):
+    """Start the stand-ins and the server, then measure the routes and the runner tick."""
+
+    def __init__(self, work_dir, port=5050, stub_port=5100, stub_latency=0.0, concurrency=4, overrides=None):
+        """Initiator.
+
+        :param work_dir: (str) directory of the generated devices and of the caches
+        :param port: (int) port of the webservice
+        :param stub_port: (int) port of the stand-in apis
+        :param stub_latency: (float) seconds added to each stand-in api response
+        :param concurrency: (int) number of concurrent callers
+        :param overrides: (dict) environment variables of the server set after the default ones
+        """
+        self.overrides = overrides or dict()
+        self.work_dir = work_dir
+        self.base_url = f"http://127.0.0.1:{port}/api/"
+        self.port = port
+        self.concurrency = concurrency
+        self.stubs = stubs.StubServer(port=stub_port, latency=stub_latency)
+        self.points = stubs.route_points()
+        self.server = None
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=concurrency))
+
+    def environment(self):
+        """Settings of the benchmarked server.
+
+        :return: (dict) environment variables
+        """
+        env = dict(os.environ)
+        env.update(self.stubs.environment())
+        env.update({
+            "server_port": str(self.port),
+            "warm_up_on_start": "false",
+            "camera_face_source": os.path.join(self.work_dir, "face.avi"),
+            "camera_front_source": os.path.join(self.work_dir, "front.avi"),
+            "gps_replay_path": os.path.join(self.work_dir, "gps.nmea"),
+            "gps_replay_interval": "0.05",
+            "tile_cache_path": os.path.join(self.work_dir, "tiles"),
+            "image_gps_path": os.path.join(self.work_dir, "gps"),
+            "ratio_index_path": os.path.join(self.work_dir, "ratio_index"),
+            "poi_cache_path": os.path.join(self.work_dir, "poi_cache"),
+            "summary_cache_path": os.path.join(self.work_dir, "summary_cache"),
+            "weather_location_path": os.path.join(self.work_dir, "weather_locations"),
+        })
+        env.update(self.overrides)
+
+        return env
+
+    def start(self, timeout=120):
+        """Generate the devices, start the stand-ins and the server.
+
+        The models and devices are created by the warm-up calls of their routes, not measured.
+
+        :param timeout: (float) seconds to wait for the server
+        """
+        stubs.write_nmea_log(os.path.join(self.work_dir, "gps.nmea"), self.points)
+        stubs.write_video(os.path.join(self.work_dir, "face.avi"), settings.IMAGE_FACE_PATH)
+        stubs.write_video(os.path.join(self.work_dir, "front.avi"), settings.IMAGE_STREET_PATH)
+        self.stubs.start()
+        self.server = subprocess.Popen(
+            [sys.executable, os.path.join(project_dir, "src", "webservice", "server.py"), "--production"],
+            env=self.environment(), cwd=str(project_dir)
+        )
+
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                self.session.get(self.base_url + "server/startup_profile", timeout=5).raise_for_status()
+                return
+            except requests.RequestException:
+                pass
+            if self.server.poll() is not None:
+                raise RuntimeError(f"The server stopped with the code {self.server.returncode}")
+            time.sleep(1)
+
+        raise RuntimeError(f"The server was not ready after {timeout}s")
+
+    def startup_profile(self):
+        """Get how long the server and each model or device took to start.
+
+        :return: (dict) startup seconds & seconds per object
+        """
+        return self.session.get(self.base_url + "server/startup_profile", timeout=10).json()["result"]
+
+    def stop(self):
+        """Stop the server and the stand-ins."""
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+        self.stubs.stop()
+
+    def frames(self):
+        """Get a frame of each camera, used by the image routes.
+
+        :return: (dict) face & front jpeg
+        """
+        return {
+            name: self.session.get(self.base_url + f"frame/get_camera_{name}", timeout=10).content
+            for name in ["face", "front"]
+        }
+
+    def measure_routes(self, count, warm_up):
+        """Measure every route.
+
+        :param count: (int) number of measured calls per route
+        :param warm_up: (int) number of calls before measuring
+        :return: (dict) blueprint/route|statistics
+        """
+        results = dict()
+        for route in routes(self.points, self.frames()):
+            def call(index, route=route):
+                response = self.session.request(route.method, self.base_url + route.path, timeout=60,
+                                                **route.request(index))
+                return response.status_code < 400
+
+            results[f"{route.blueprint}/{route.name}"] = measure(call, count, self.concurrency, warm_up)
+            print(route.blueprint, route.name, results[f"{route.blueprint}/{route.name}"])
+
+        return results
+
+    def measure_tick(self, count, warm_up, aggregated=False):
+        """Measure the full tick of the runner, nothing is played.
+
+        :param count: (int) number of measured ticks
+        :param warm_up: (int) number of ticks before measuring
+        :param aggregated: (bool) use the single tick api call
+        :return: (dict) statistics, and the mean milliseconds of each stage
+        """
+        from src.runner import Runner
+
+        runner = Runner(
+            client=WebserviceClient(base_url=self.base_url, retries=0), aggregated=aggregated, record_timings=True
+        )
+
+        def call(index):
+            tasks = runner.aggregated_tick_tasks() if aggregated else runner.tick_tasks()
+            runner.api_calls(runner.quiet_tasks(tasks))
+            return True
+
+        for index in range(warm_up):
+            call(index)
+        runner.executor.timings.clear()
+        result = measure(call, count, 1, 0)
+        result["stages_mean_ms"] = {
+            name: round(1000 * sum(timings) / len(timings), 3)
+            for name, timings in sorted(runner.executor.timings.items())
+        }
+
+        return result
+
+
+def git_commit():
+    """Commit of the benchmarked code.
+
+    :return: (str) commit hash, None outside of a git repository
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=str(project_dir)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """Run the benchmark and write the report.
+
+    :param args: (argparse.Namespace) arguments
+    :return: (str) path of the report
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        benchmark = Benchmark(work_dir, args.port, args.stub_port, args.stub_latency, args.concurrency)
+        try:
+            benchmark.start()
+            report = {
+                "created": datetime.datetime.utcnow().isoformat() + "+00:00",
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "config": vars(args),
+                "routes": benchmark.measure_routes(args.requests, args.warm_up),
+                "tick": benchmark.measure_tick(args.ticks, args.warm_up),
+                "aggregated_tick": benchmark.measure_tick(args.ticks, args.warm_up, aggregated=True),
+                "startup": benchmark.startup_profile()
+            }
+        finally:
+            benchmark.stop()
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"benchmark_{datetime.datetime.utcnow():%Y%m%d_%H%M%S}.json")
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    return path
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the webservice routes and the runner tick.")
+    arg_parser.add_argument("--requests", type=int, default=100, help="measured calls per route")
+    arg_parser.add_argument("--ticks", type=int, default=20, help="measured runner ticks")
+    arg_parser.add_argument("--warm-up", type=int, default=3, help="calls before measuring")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="concurrent callers per route")
+    arg_parser.add_argument("--port", type=int, default=5050, help="port of the webservice")
+    arg_parser.add_argument("--stub-port", type=int, default=5100, help="port of the stand-in apis")
+    arg_parser.add_argument("--stub-latency", type=float, default=0.05, help="seconds added by the stand-in apis")
+    arg_parser.add_argument("--output", default=REPORT_PATH, help="directory of the json reports")
+
+    print("Report:", run(arg_parser.parse_args()))
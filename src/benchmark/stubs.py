@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Local stand-ins for the devices and the external apis, used by the benchmarks."""
+import os
+import time
+import zlib
+import datetime
+import threading
+from io import BytesIO
+
+import cv2
+import flask
+import numpy as np
+from PIL import Image
+from werkzeug.serving import make_server
+
+STUB_APP = flask.Flask(__name__)
+STUB_APP.config["LATENCY"] = 0.0
+
+FOREST = (195, 230, 200)
+WATER = (175, 210, 230)
+ROAD = (255, 255, 255)
+
+POIS = [
+    ("Parc de Saint-Cloud", ["park", "point_of_interest", "establishment"]),
+    ("Musée de la Céramique", ["museum", "point_of_interest", "establishment"]),
+    ("Église Saint-Clodoald", ["church", "place_of_worship", "point_of_interest"]),
+    ("Boulangerie du Parc", ["bakery", "food", "store"]),
+]
+
+
+@STUB_APP.before_request
+def simulate_latency():
+    """Wait like a remote api would."""
+    if STUB_APP.config["LATENCY"]:
+        time.sleep(STUB_APP.config["LATENCY"])
+
+
+def static_map_image(center, size=(600, 300)):
+    """Draw a fake roadmap, the share of forest and water depends on the center.
+
+    :param center: (str) center of the map, ex: 48.83+2.23
+    :param size: (tuple) width, height
+    :return: (bytes) png
+    """
+    width, height = size
+    seed = zlib.crc32(center.encode())
+    img = np.full((height, width, 3), ROAD, dtype=np.uint8)
+    img[:, :int(width * (seed % 60) / 100)] = FOREST
+    img[int(height * (1 - (seed >> 8) % 30 / 100)):, :] = WATER
+    buffer = BytesIO()
+    Image.fromarray(img).save(buffer, format="PNG")
+
+    return buffer.getvalue()
+
+
+@STUB_APP.route("/maps/staticmap")
+def static_map():
+    """Google maps static api."""
+    size = tuple(int(side) for side in flask.request.args.get("size", "600x300").split("x"))
+
+    return flask.Response(static_map_image(flask.request.args.get("center", ""), size), mimetype="image/png")
+
+
+@STUB_APP.route("/maps/place/nearbysearch/json")
+def nearby_search():
+    """Google places nearby search api."""
+    lat, lng = (float(value) for value in flask.request.args["location"].split(","))
+    results = [
+        {
+            "id": str(index), "place_id": f"stub-{index}", "reference": f"stub-{index}", "name": name,
+            "types": types, "vicinity": "Saint-Cloud",
+            "geometry": {"location": {"lat": lat + index * 1e-4, "lng": lng + index * 1e-4}}
+        }
+        for index, (name, types) in enumerate(POIS)
+    ]
+
+    return flask.jsonify({"status": "OK", "results": results, "html_attributions": []})
+
+
+@STUB_APP.route("/wikipedia/w/api.php")
+def wikipedia_api():
+    """Wikipedia api, only the search, page info and extract queries used by wikipedia.summary."""
+    args = flask.request.args
+    if args.get("list") == "search":
+        return flask.jsonify({"query": {"searchinfo": {}, "search": [{"title": args["srsearch"]}]}})
+    title = args.get("titles", "Stub")
+    if "extracts" in args.get("prop", ""):
+        page = {"pageid": 1, "title": title, "extract": f"{title} is a landmark of the benchmark route."}
+    else:
+        page = {"pageid": 1, "title": title, "fullurl": "https://en.wikipedia.org/wiki/Stub"}
+
+    return flask.jsonify({"query": {"pages": {"1": page}}})
+
+
+@STUB_APP.route("/accuweather/locations/v1/cities/geoposition/search")
+def accuweather_location():
+    """Accuweather geoposition api."""
+    return flask.jsonify({"Key": "623"})
+
+
+@STUB_APP.route("/accuweather/currentconditions/v1/<key>")
+def accuweather_conditions(key):
+    """Accuweather current conditions api."""
+    return flask.jsonify([{"WeatherText": "Sunny"}])
+
+
+@STUB_APP.route("/spotify/token", methods=["POST"])
+def spotify_token():
+    """Spotify client credentials token api."""
+    return flask.jsonify({"access_token": "stub", "token_type": "Bearer", "expires_in": 3600})
+
+
+@STUB_APP.route("/spotify/v1/recommendations")
+def spotify_recommendations():
+    """Spotify recommendations api."""
+    limit = int(flask.request.args.get("limit", 20))
+    tracks = [
+        {"id": f"track-{index}", "name": f"Track {index}", "preview_url": f"https://p.scdn.co/mp3-preview/{index}"}
+        for index in range(limit)
+    ]
+
+    return flask.jsonify({"tracks": tracks, "seeds": []})
+
+
+class StubServer(object):
+    """Serve the stand-in apis in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=5100, latency=0.0):
+        """Initiator.
+
+        :param host: (str) host
+        :param port: (int) port
+        :param latency: (float) seconds added to each response
+        """
+        STUB_APP.config["LATENCY"] = latency
+        self.url = f"http://{host}:{port}"
+        self.server = make_server(host, port, STUB_APP, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        """Start serving."""
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving."""
+        self.server.shutdown()
+
+    def environment(self):
+        """Settings pointing the webservice to the stand-in apis.
+
+        :return: (dict) environment variables
+        """
+        return {
+            "google_key": "stub",
+            "accuweathher_api_key": "stub",
+            "spotify_id": "stub",
+            "spotify_pwd": "stub",
+            "google_maps_url": f"{self.url}/maps/staticmap?",
+            "google_places_url": f"{self.url}/maps/place/nearbysearch/json?",
+            "wikipedia_api_url": f"{self.url}/wikipedia/w/api.php",
+            "accuweather_url": f"{self.url}/accuweather",
+            "spotify_token_url": f"{self.url}/spotify/token",
+            "spotify_api_url": f"{self.url}/spotify/v1/",
+        }
+
+
+def nmea_sentence(body):
+    """Add the checksum to a NMEA sentence.
+
+    :param body: (str) sentence without $ and checksum
+    :return: (str) sentence
+    """
+    checksum = 0
+    for char in body:
+        checksum ^= ord(char)
+
+    return f"${body}*{checksum:02X}"
+
+
+def nmea_coordinate(value, digits):
+    """Format a coordinate as NMEA degrees and minutes.
+
+    :param value: (float) absolute coordinate in degrees
+    :param digits: (int) number of digits of the degrees
+    :return: (str) ex: 4849.8268
+    """
+    degrees = int(value)
+
+    return f"{degrees:0{digits}d}{(value - degrees) * 60:07.4f}"
+
+
+def write_nmea_log(path, points, speed=27.0, start=None):
+    """Write a NMEA log driving through points, one GGA and one RMC sentence per second.
+
+    :param path: (str) path of the log
+    :param points: (list) latitude, longitude of each second
+    :param speed: (float) speed in knots
+    :param start: (datetime.datetime) utc time of the first point, now if None
+    """
+    start = start or datetime.datetime.utcnow().replace(microsecond=0)
+    with open(path, "w") as nmea_log:
+        for second, (lat, lng) in enumerate(points):
+            now = start + datetime.timedelta(seconds=second)
+            hms = now.strftime("%H%M%S")
+            lat_nmea = f"{nmea_coordinate(abs(lat), 2)},{'N' if lat >= 0 else 'S'}"
+            lng_nmea = f"{nmea_coordinate(abs(lng), 3)},{'E' if lng >= 0 else 'W'}"
+            nmea_log.write(nmea_sentence(f"GPGGA,{hms},{lat_nmea},{lng_nmea},1,08,0.9,35.0,M,47.0,M,,") + "\n")
+            nmea_log.write(nmea_sentence(
+                f"GPRMC,{hms},A,{lat_nmea},{lng_nmea},{speed:.1f},90.0,{now.strftime('%d%m%y')},,,A"
+            ) + "\n")
+
+
+def route_points(start=(48.830446, 2.233111), count=300, step=(1e-4, 1.5e-4)):
+    """Points of a straight route.
+
+    :param start: (tuple) latitude, longitude of the first point
+    :param count: (int) number of points
+    :param step: (tuple) latitude, longitude added between two points
+    :return: (list) latitude, longitude
+    """
+    return [(start[0] + index * step[0], start[1] + index * step[1]) for index in range(count)]
+
+
+def write_video(path, image_dir=None, size=(640, 480), count=50, fps=10):
+    """Write a video used as a fake camera, from the jpeg images of a directory or from noise.
+
+    :param path: (str) path of the video, .avi
+    :param image_dir: (str) directory of jpeg images, searched recursively, ex: faces to recognise
+    :param size: (tuple) width, height
+    :param count: (int) number of frames without images
+    :param fps: (int) frames per second
+    """
+    images = list()
+    for root, _, filenames in sorted(os.walk(image_dir)) if image_dir else []:
+        images += [
+            cv2.resize(cv2.imread(os.path.join(root, filename)), size)
+            for filename in sorted(filenames) if filename.lower().endswith(".jpg")
+        ]
+    if not images:
+        random = np.random.RandomState(0)
+        images = [random.randint(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for image in images:
+        writer.write(image)
+    writer.release()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import shelve
+import threading
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """Thread safe cache, the entries expire after a time to live and the oldest are dropped first."""
+
+    def __init__(self, maxsize=1024, ttl=600):
+        """Initiator.
+
+        :param maxsize: (int) maximum number of entries
+        :param ttl: (float) seconds an entry is kept
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        """Number of entries, expired ones included."""
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        """Get a value from the cache.
+
+        :param key: key of the entry
+        :param default: returned if the entry is missing or expired
+        :return: the value
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return default
+
+            return value
+
+    def set(self, key, value):
+        """Put a value in the cache.
+
+        :param key: key of the entry
+        :param value: value
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get_or_set(self, key, compute):
+        """Get a value from the cache, computing and caching it if it is missing.
+
+        :param key: key of the entry
+        :param compute: (callable) computes the value on a miss
+        :return: the value
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+
+        return value
+
+    def clear(self):
+        """Remove all the entries."""
+        with self.lock:
+            self.entries.clear()
+
+
+class PersistentTTLCache(object):
+    """Thread safe cache kept in a shelve file, so the entries survive a restart until their time to live."""
+
+    def __init__(self, path, ttl=86400):
+        """Initiator.
+
+        :param path: (str) shelve file path
+        :param ttl: (float) seconds an entry is kept
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.shelf = shelve.open(path, flag="c")
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        """Number of entries, expired ones included."""
+        with self.lock:
+            return len(self.shelf)
+
+    def get(self, key, default=None):
+        """Get a value from the cache.
+
+        :param key: (str) key of the entry
+        :param default: returned if the entry is missing or expired
+        :return: the value
+        """
+        with self.lock:
+            entry = self.shelf.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.shelf[key]
+                return default
+
+            return value
+
+    def set(self, key, value):
+        """Put a value in the cache and write it to disk.
+
+        :param key: (str) key of the entry
+        :param value: picklable value
+        """
+        with self.lock:
+            self.shelf[key] = (time.time() + self.ttl, value)
+            self.shelf.sync()
+
+    def get_or_set(self, key, compute):
+        """Get a value from the cache, computing and caching it if it is missing.
+
+        :param key: (str) key of the entry
+        :param compute: (callable) computes the value on a miss
+        :return: the value
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+
+        return value
+
+    def clear(self):
+        """Remove all the entries."""
+        with self.lock:
+            self.shelf.clear()
+            self.shelf.sync()
+
+    def close(self):
+        """Close the shelve file."""
+        with self.lock:
+            self.shelf.close()
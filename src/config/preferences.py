@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import threading
+
+from src import settings
+
+
+class PreferenceStore(object):
+    """Driver preferences kept in memory, reloaded in the background when the file changes."""
+
+    def __init__(self, path=settings.USER_PREFERENCES_PATH, interval=settings.PREFERENCES_RELOAD_INTERVAL):
+        """Initiator.
+
+        :param path: (str) path of the json preferences, driver|genres
+        :param interval: (float) seconds between two checks of the file
+        """
+        self.path = path
+        self.interval = interval
+        self.preferences = dict()
+        self.signature = None
+        self.stopped = threading.Event()
+        self.reload()
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+        self.thread.start()
+
+    def reload(self):
+        """Load the file if it changed since the last load.
+
+        :return: (bool) True if the preferences were reloaded
+        """
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self.signature:
+            return False
+        with open(self.path) as f:
+            preferences = json.load(f)
+        self.preferences = preferences
+        self.signature = signature
+
+        return True
+
+    def _watch(self):
+        """Check the file until the store is stopped, the last good preferences are kept on errors."""
+        while not self.stopped.wait(self.interval):
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                print("Reload of", self.path, "failed:", e)
+
+    def stop(self):
+        """Stop watching the file."""
+        self.stopped.set()
+
+    def __getitem__(self, driver):
+        """Get the preferences of a driver, without touching the disk.
+
+        :param driver: (str) driver name
+        :return: (list) genres
+        """
+        return self.preferences[driver]
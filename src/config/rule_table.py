@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+RULE_PARAMS = [
+    "target_acousticness", "target_energy", "target_danceability", "target_instrumentalness",
+    "target_valence", "target_loudness", "target_liveness"
+]
+
+
+class RuleTable(object):
+    """Rules of settings.csv compiled into a numeric table, one row per (variable, value)."""
+
+    def __init__(self, keys, matrix, genres, params=RULE_PARAMS):
+        """Initiator.
+
+        :param keys: (list) (variable, value) of each row
+        :param matrix: (np.array) (rows, params) float adjustments
+        :param genres: (list) seed genres of each row, None if there is none
+        :param params: (list) name of each column
+        """
+        self.keys = list(keys)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(len(self.keys), len(params))
+        self.genres = list(genres)
+        self.params = list(params)
+        self.columns = {param: column for column, param in enumerate(self.params)}
+
+    @classmethod
+    def from_csv(cls, config_filepath, schema, params=RULE_PARAMS):
+        """Compile the rules of a csv file.
+
+        :param config_filepath: (str) path of the rules
+        :param schema: (dict) file schema
+        :param params: (list) name of the numeric columns
+        :return: (RuleTable) rule table
+        """
+        rule_dataframe = pd.read_csv(config_filepath, sep=";", dtype=schema, na_values="")
+        keys = zip(rule_dataframe["variable"], rule_dataframe["value"])
+        genres = [
+            genre.split("/") if isinstance(genre, str) else None
+            for genre in rule_dataframe["seed_genres"]
+        ]
+
+        return cls(keys, rule_dataframe[params].values, genres, params)
+
+    def row(self, variable, value):
+        """Get the row of a rule.
+
+        :param variable: (str) variable, ex: meteo
+        :param value: (str) value, ex: sunny
+        :return: (int) row
+        """
+        return self.index[(variable, value)]
+
+    def rule_dict(self, variable, value):
+        """Get a rule as a dict.
+
+        :param variable: (str) variable, ex: meteo
+        :param value: (str) value, ex: sunny
+        :return: (dict) param|adjustment, and seed_genres if the rule has some
+        """
+        row = self.row(variable, value)
+        rule = {param: float(self.matrix[row, column]) for param, column in self.columns.items()}
+        if self.genres[row] is not None:
+            rule["seed_genres"] = self.genres[row]
+
+        return rule
+
+    def to_dict(self):
+        """Get all the rules as nested dicts.
+
+        :return: (dict) variable|value|rule
+        """
+        rules = dict()
+        for variable, value in self.keys:
+            rules.setdefault(variable, dict())[value] = self.rule_dict(variable, value)
+
+        return rules
+
+    def add(self, variable, value, param, adjustment):
+        """Add an adjustment to a rule.
+
+        :param variable: (str) variable, ex: meteo
+        :param value: (str) value, ex: sunny
+        :param param: (str) param, ex: target_energy, or seed_genres to add genres
+        :param adjustment: (float|list) added to the param
+        """
+        row = self.row(variable, value)
+        if param == "seed_genres":
+            self.genres[row] = (self.genres[row] or list()) + list(adjustment)
+        else:
+            self.matrix[row, self.columns[param]] += adjustment
+
+    def combine(self, conditions):
+        """Sum the rules of the current conditions.
+
+        :param conditions: (dict) variable|value, ex: {"meteo": "sunny", "mood": "happy"}
+        :return: (dict) param|summed adjustment, and seed_genres of all the rules
+        """
+        rows = [self.row(variable, value) for variable, value in conditions.items()]
+        combined = dict(zip(self.params, self.matrix[rows].sum(axis=0).tolist()))
+        genres = list()
+        for row in rows:
+            for genre in self.genres[row] or list():
+                if genre not in genres:
+                    genres.append(genre)
+        if genres:
+            combined["seed_genres"] = genres
+
+        return combined
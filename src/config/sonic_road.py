@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
-import json
 import math
+import time
 import bisect
 import datetime
+import threading
 import spotipy
+import numpy as np
 import pandas as pd
 
 from dateutil import parser
 import spotipy.oauth2 as oauth2
 
 from src import settings
+from src.cache import TTLCache
+from src.config.preferences import PreferenceStore
+from src.config.rule_table import RuleTable
+from src.metrics import timed
+
+DAY_CATEGORIES = np.array(["night", "sunrise", "morning", "afternoon", "sunset", "night"])
 
 
 class SonicRoadSettings(object):
@@ -21,6 +29,12 @@ class SonicRoadSettings(object):
             client_id=settings.spotify_id,
             client_secret=settings.spotify_pwd
         )
+        if settings.spotify_token_url:
+            self.credentials.OAUTH_TOKEN_URL = settings.spotify_token_url
+        self.spotify = None
+        self.token_expires_at = 0
+        self.spotify_lock = threading.Lock()
+        self.recommendations = TTLCache(settings.SPOTIFY_CACHE_SIZE, settings.SPOTIFY_CACHE_TTL)
         self.schema = {
             'variable': str,
             'value': str,
@@ -33,9 +47,11 @@ class SonicRoadSettings(object):
             'target_valence': float,
             'seed_genres': str
         }
-        self.rules = self.get_dict_config(settings.RULES_PATH, self.schema)
+        self.rule_table = RuleTable.from_csv(settings.RULES_PATH, self.schema)
+        self.rules = self.rule_table.to_dict()
         self.mood_preferences = ""
         self.driver_genre_preferences = ""
+        self.preference_store = PreferenceStore()
 
     @staticmethod
     def get_dict_config(config_filepath, schema):
@@ -45,32 +61,7 @@ class SonicRoadSettings(object):
         :param schema: (dict) file schema
         :return: (dict) python config file dictionary
         """
-        rule_dataframe = pd.read_csv(config_filepath, sep=";", dtype=schema, na_values="")
-        rule_dataframe.seed_genres = rule_dataframe.seed_genres.str.split("/")
-
-        grouped_rule_dataframe = rule_dataframe.groupby(["variable"])
-        params = {}
-
-        for k, v in grouped_rule_dataframe.indices.items():
-            tmp_dict = {}
-            for i in v:
-                row = rule_dataframe.iloc[i]
-                value = row.value
-                update_dict = {
-                    "target_acousticness": float(row.target_acousticness),
-                    "target_energy": float(row.target_energy),
-                    "target_danceability": float(row.target_danceability),
-                    "target_instrumentalness": float(row.target_instrumentalness),
-                    "target_valence": float(row.target_valence),
-                    "target_loudness": float(row.target_loudness),
-                    "target_liveness": float(row.target_liveness)
-                }
-                if not type(row.seed_genres) == float:
-                    update_dict["seed_genres"] = row.seed_genres
-                tmp_dict.update({value: update_dict})
-            params.update({k: tmp_dict})
-
-        return params
+        return RuleTable.from_csv(config_filepath, schema).to_dict()
 
     def add_config_dict(self, dict_to_add):
         """Adds a dictionary to base one. The parameters are added to the base dict.
@@ -81,14 +72,25 @@ class SonicRoadSettings(object):
         for variable, d in dict_to_add.items():
             for value, dd in d.items():
                 for param, param_value in dd.items():
-                    base_value = self.rules[variable][value][param]
-                    try:
-                        self.rules[variable][value][param] = base_value + param_value
-                    finally:
-                        pass
+                    self.rule_table.add(variable, value, param, param_value)
+                self.rules[variable][value] = self.rule_table.rule_dict(variable, value)
 
         return self.rules
 
+    def combine_params(self, conditions, speed=None):
+        """Combine the rules of the current conditions, and the speed adjustments.
+
+        :param conditions: (dict) variable|value, ex: {"meteo": "sunny", "day/night": "night"}
+        :param speed: (float) speed of the car
+        :return: (dict) spotify target params and seed_genres
+        """
+        params = self.rule_table.combine(conditions)
+        if speed is not None:
+            params["target_energy"] += self.sigmoid_from_speed(speed, -0.1, 0.4, 50)
+            params["min_tempo"] = self.min_tempo_from_speed(speed)
+
+        return params
+
     @staticmethod
     def sigmoid_from_speed(speed, min, max, neutral_speed):
         """This is the energy function based on speed (the smooth coeff 0.1 is for now fixed).
@@ -115,6 +117,7 @@ class SonicRoadSettings(object):
         else:
             return speed * 2 - 80
 
+    @timed("sonic_road.category_from_now_sunset_sunrise_time")
     def category_from_now_sunset_sunrise_time(self, **kwargs):
         """Get category (among night, afternoon, morning, sunset, sunrise) based on sunset, sunrise and now time.
 
@@ -135,9 +138,92 @@ class SonicRoadSettings(object):
 
         time_seq = [sunrise_time_start, sunrise_time_end, noon_time, sunset_time_start, sunset_time_end]
         bisect_index = bisect.bisect_left(time_seq, now_time)
-        categories = ["night", "sunrise", "morning", "afternoon", "sunset", "night"]
 
-        return self.rules["day/night"][categories[bisect_index]]
+        return self.rules["day/night"][DAY_CATEGORIES[bisect_index]]
+
+    @staticmethod
+    def sigmoid_from_speeds(speeds, min, max, neutral_speed):
+        """Array version of sigmoid_from_speed.
+
+        :param speeds: (np.array) speeds of a trip
+        :param min: (float) the - inf asymptote of the sigmoid
+        :param max: (float) the + inf asymptote of the sigmoid
+        :param neutral_speed: (float) the offset put to the function to get 0 energy at this speed
+        :return: (np.array) the deducted energy of each speed
+        """
+        offset = 10 * math.log((min - max) / min - 1) + neutral_speed
+
+        return (max - min) / (1 + np.exp(-0.1 * (np.asarray(speeds, dtype=np.float64) - offset))) + min
+
+    @staticmethod
+    def min_tempo_from_speeds(speeds):
+        """Array version of min_tempo_from_speed.
+
+        :param speeds: (np.array) speeds of a trip
+        :return: (np.array) the min_tempo deducted from each speed
+        """
+        speeds = np.asarray(speeds, dtype=np.float64)
+
+        return np.where(speeds < 100, 0, speeds * 2 - 80)
+
+    @staticmethod
+    def parse_times(times):
+        """Parse times once, each time keeps its own utc offset, the times without offset are utc.
+
+        :param times: (np.array|list) str ex: 2019-02-06T07:13:15+00:00, or datetime64
+        :return: (np.array, np.array) utc nanoseconds, utc nanoseconds of the local noon of each time
+        """
+        times = pd.Series(np.atleast_1d(times))
+        utc = pd.to_datetime(times, utc=True).dt.tz_localize(None)
+        try:
+            local = pd.to_datetime(times)
+        except ValueError:
+            local = None
+        if local is None or not pd.api.types.is_datetime64_any_dtype(local):
+            # mixed utc offsets, ex: a trip across a daylight saving change, read the local time of each one
+            local = pd.to_datetime(times.map(lambda time: pd.Timestamp(time).replace(tzinfo=None)))
+        elif local.dt.tz is not None:
+            local = local.dt.tz_localize(None)
+        utc_ns = utc.values.astype(np.int64)
+        noon_ns = (local.dt.normalize() + pd.Timedelta(hours=12)).values.astype(np.int64)
+
+        return utc_ns, noon_ns - (local.values.astype(np.int64) - utc_ns)
+
+    def categories_from_times(self, now_times, sunrise_times, sunset_times):
+        """Array version of category_from_now_sunset_sunrise_time.
+
+        :param now_times: (np.array) local times of a trip
+        :param sunrise_times: (np.array) sunrise time of each now time, or a single one
+        :param sunset_times: (np.array) sunset time of each now time, or a single one
+        :return: (np.array) night, afternoon, morning, sunset or sunrise for each now time
+        """
+        now_ns, noon_ns = self.parse_times(now_times)
+        sunrise_ns, _ = self.parse_times(sunrise_times)
+        sunset_ns, _ = self.parse_times(sunset_times)
+        margin = pd.Timedelta(minutes=15).value
+
+        time_seq = np.stack(np.broadcast_arrays(
+            sunrise_ns - margin, sunrise_ns + margin, noon_ns, sunset_ns - margin, sunset_ns + margin
+        ), axis=1)
+        bisect_index = (time_seq < now_ns[:, None]).sum(axis=1)
+
+        return DAY_CATEGORIES[bisect_index]
+
+    @timed("sonic_road.get_trip_params")
+    def get_trip_params(self, speeds, now_times, sunrise_times, sunset_times):
+        """Get the speed energy, min_tempo and day/night category of a whole trip in one call.
+
+        :param speeds: (np.array) speed at each time
+        :param now_times: (np.array) local times of the trip
+        :param sunrise_times: (np.array) sunrise time of each now time, or a single one
+        :param sunset_times: (np.array) sunset time of each now time, or a single one
+        :return: (pd.DataFrame) speed_energy, min_tempo and day/night of each time
+        """
+        return pd.DataFrame({
+            "speed_energy": self.sigmoid_from_speeds(speeds, -0.1, 0.4, 50),
+            "min_tempo": self.min_tempo_from_speeds(speeds),
+            "day/night": self.categories_from_times(now_times, sunrise_times, sunset_times)
+        })
 
     def load_user_preferences(self, driver):
         """Load user preferences.
@@ -145,9 +231,7 @@ class SonicRoadSettings(object):
         :arg driver: (str) driver name
         :return: (dict) read user preferences
         """
-        with open(settings.USER_PREFERENCES_PATH) as f:
-            driver_genre_preferences = json.load(f)
-        self.driver_genre_preferences = driver_genre_preferences[driver]
+        self.driver_genre_preferences = self.preference_store[driver]
 
         return self.driver_genre_preferences
 
@@ -159,12 +243,50 @@ class SonicRoadSettings(object):
         """
         return self.rules["mood"][mood]
 
+    @timed("sonic_road.get_spotify")
+    def get_spotify(self):
+        """Get the spotify client, its token is refreshed only when it is about to expire.
+
+        :return: (spotipy.Spotify) spotify client
+        """
+        with self.spotify_lock:
+            if self.spotify is None or time.time() > self.token_expires_at - settings.SPOTIFY_TOKEN_MARGIN:
+                token = self.credentials.get_access_token()
+                self.spotify = spotipy.Spotify(auth=token)
+                if settings.spotify_api_url:
+                    self.spotify.prefix = settings.spotify_api_url
+                token_info = getattr(self.credentials, "token_info", None) or {}
+                self.token_expires_at = token_info.get("expires_at", time.time() + settings.SPOTIFY_TOKEN_TTL)
+
+            return self.spotify
+
+    @staticmethod
+    def recommendation_key(params):
+        """Quantise the recommendation params, near identical params get the same key.
+
+        :param params: (dict) spotify recommendation params
+        :return: (tuple) key
+        """
+        key = list()
+        for name, value in sorted(params.items()):
+            if isinstance(value, (list, tuple)):
+                value = tuple(sorted(value))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                step = settings.SPOTIFY_TEMPO_STEP if "tempo" in name else settings.SPOTIFY_PARAM_STEP
+                value = round(value / step)
+            key.append((name, value))
+
+        return tuple(key)
+
+    @timed("sonic_road.get_recommendations_from_params")
     def get_recommendations_from_params(self, params):
-        """Get spotify recommendations.
+        """Get spotify recommendations, cached for near identical params.
 
         :return: (str) URL of mp3 preview of the recommended song
         """
-        token = self.credentials.get_access_token()
-        spotify = spotipy.Spotify(auth=token)
+        def recommend():
+            spotify = self.get_spotify()
+            with timed("sonic_road.spotify_recommendations"):
+                return spotify.recommendations(limit=50, **params)
 
-        return spotify.recommendations(limit=50, **params)
+        return self.recommendations.get_or_set(self.recommendation_key(params), recommend)
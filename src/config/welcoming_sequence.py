@@ -1,22 +1,73 @@
 # -*- coding: utf-8 -*-
 import wikipedia
+from concurrent.futures import ThreadPoolExecutor
+
+from src import settings
+from src.cache import PersistentTTLCache
+from src.metrics import timed
 
 
 class WelcomingSequenceSettings(object):
     """Some utils function for this module."""
 
-    def __init__(self):
-        """Initiator."""
-        pass
+    def __init__(self, summaries=None):
+        """Initiator.
+
+        :param summaries: (PersistentTTLCache) summary cache, the default one if None
+        """
+        if summaries is None:
+            summaries = PersistentTTLCache(settings.SUMMARY_CACHE_PATH, settings.SUMMARY_CACHE_TTL)
+        self.summaries = summaries
+        self.executor = ThreadPoolExecutor(max_workers=settings.SUMMARY_WORKERS)
+        if settings.wikipedia_api_url:
+            wikipedia.wikipedia.API_URL = settings.wikipedia_api_url
 
     @staticmethod
+    @timed("featuring.wikipedia_summary")
     def information_about_poi(poi):
         """Information about a poi.
 
-        :param poi: (google_places) poi
-        :return: (str) information about this poi or the name
+        :param poi: (dict) poi name|types|place_id
+        :return: (str, bool) information about this poi or the name, and whether it can be cached:
+            False when wikipedia could not be reached
         """
         try:
-            return wikipedia.summary(poi.name, sentences=1)
-        except:
-            return poi.name
+            return wikipedia.summary(poi["name"], sentences=1), True
+        except (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError):
+            return poi["name"], True
+        except Exception:
+            return poi["name"], False
+
+    @staticmethod
+    def summary_key(poi):
+        """Key of a poi in the summary cache.
+
+        :param poi: (dict) poi name|types|place_id
+        :return: (str) place id, or the name if the poi has none
+        """
+        return "place_id:" + poi["place_id"] if poi.get("place_id") else "name:" + poi["name"]
+
+    def information_about_pois(self, pois):
+        """Information about several pois, the ones missing from the cache are fetched concurrently.
+
+        :param pois: (list) poi dicts
+        :return: (list) information about each poi
+        """
+        keys = [self.summary_key(poi) for poi in pois]
+        missing = object()
+        summaries = [self.summaries.get(key, missing) for key in keys]
+        misses = {
+            key: self.executor.submit(self.information_about_poi, poi)
+            for key, poi, summary in zip(keys, pois, summaries)
+            if summary is missing
+        }
+        fetched = dict()
+        for key, future in misses.items():
+            fetched[key], cacheable = future.result()
+            if cacheable:
+                self.summaries.set(key, fetched[key])
+
+        return [
+            fetched[key] if summary is missing else summary
+            for key, summary in zip(keys, summaries)
+        ]
@@ -10,23 +10,28 @@ import requests
 import google_streetview.api
 
 from src import settings
+from src.data.tile_cache import TileCache, latlon_to_tile, tile_center
+from src.metrics import timed
 
 
 class GoogleImages(object):
     """Save pictures from google using the lat lon."""
 
-    def __init__(self, show=False):
+    def __init__(self, show=False, cache=None):
         """Initiator.
 
         :arg show: (bool) show or not the images
+        :arg cache: (TileCache) cache of the gps images, one is created if None
         """
         self.key = settings.google_key
         self.show = show
         self.size = "600x300"
         self.zoom = "16"
         self.roadmap = "roadmap"
-        self.base_url = "https://maps.googleapis.com/maps/api/staticmap?"
+        self.base_url = settings.google_maps_url
         self.url = "{base_url}center={lat}+{lng}&zoom={zoom}&size={size}&maptype={roadmap}&key={key}"
+        self.tile_zoom = settings.TILE_ZOOM
+        self.cache = cache if cache is not None else TileCache()
         gmaps.configure(api_key=self.key)
 
     def show_img(self, img):
@@ -46,15 +51,18 @@ class GoogleImages(object):
         :param lat: (float) latitude
         :param lng:  (float) longitude
         """
+        os.makedirs(settings.IMAGE_GPS_PATH, exist_ok=True)
         path = os.path.join(settings.IMAGE_GPS_PATH, f"{lat}+{lng}.jpg")
         img.save(path)
 
-    def image_gps(self, lat, lng):
-        """Get image from google maps api.
+    @timed("featuring.download_tile")
+    def _download_tile(self, tile):
+        """Download the image centered on a tile from google maps api.
 
-        :arg lat: (float) latitude
-        :arg lng: (float) longitude
+        :arg tile: (tuple) zoom, x, y
+        :return: (np.array) image
         """
+        lat, lng = tile_center(*tile)
         url = self.url.format(**{
             "lat": lat, "lng": lng, "key": self.key, "size": self.size,
             "zoom": self.zoom, "roadmap": self.roadmap, "base_url": self.base_url
@@ -66,6 +74,21 @@ class GoogleImages(object):
 
         return np.asarray(img)
 
+    @timed("featuring.image_gps")
+    def image_gps(self, lat, lng):
+        """Get image from google maps api.
+
+        The image is centered on the tile which contains the position, so the nearby
+        positions share the same cached image.
+
+        :arg lat: (float) latitude
+        :arg lng: (float) longitude
+        :return: (np.array) image, read only
+        """
+        tile = latlon_to_tile(lat, lng, self.tile_zoom)
+
+        return self.cache.get_or_fetch(tile, self._download_tile)
+
     def image_street(self, lat, lng):
         """Get image from google street api.
 
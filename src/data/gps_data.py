@@ -1,45 +1,199 @@
 # -*- coding: utf-8 -*-
+import time
+import datetime
+import threading
+import collections
+
 import serial
 import pynmea2
 
+from src import settings
+from src.metrics import timed
+
+GPSFix = collections.namedtuple("GPSFix", ["latitude", "longitude", "timestamp", "speed", "quality"])
+
+
+class NMEAReplay(object):
+    """Replay a NMEA log file as if it was the serial port of the gps."""
+
+    def __init__(self, path, interval=0.0, loop=True):
+        """Initiator.
+
+        :param path: (str) path of the NMEA log
+        :param interval: (float) seconds between two sentences
+        :param loop: (bool) restart from the beginning at the end of the file
+        """
+        self.path = path
+        self.interval = interval
+        self.loop = loop
+        self.file = open(path, "rb")
+
+    def readline(self):
+        """Read the next sentence.
+
+        :return: (bytes) NMEA sentence, empty at the end of the file
+        """
+        if self.interval:
+            time.sleep(self.interval)
+        line = self.file.readline()
+        if not line and self.loop:
+            self.file.seek(0)
+            line = self.file.readline()
+
+        return line
+
+    def close(self):
+        """Close the log."""
+        self.file.close()
+
 
 class GPSInfo(object):
-    """Get gps informations."""
+    """Get gps informations, the sentences are read in the background."""
+
+    def __init__(self, com="COM4", source=None, max_age=settings.GPS_FIX_MAX_AGE):
+        """Initiator.
+
+        :param com: (str) serial port of the gps
+        :param source: (object) any object with a readline method used instead of the serial port
+        :param max_age: (float) seconds after which the latest position or speed is no longer valid
+        """
+        self.m_serial = source if source is not None else serial.Serial(com, 4800)
+        self.max_age = max_age
+        self.fix = GPSFix(None, None, None, None, 0)
+        self.position_time = None
+        self.speed_time = None
+        self.lock = threading.Lock()
+        self.position_ready = threading.Event()
+        self.speed_ready = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        """Parse every sentence until the reader is stopped."""
+        while not self.stopped.is_set():
+            with timed("gps.readline"):
+                data_line = self.m_serial.readline().decode(errors="ignore").strip()
+            if not data_line:
+                time.sleep(0.05)
+                continue
+            try:
+                self.update(pynmea2.parse(data_line))
+            except (pynmea2.ParseError, ValueError, AttributeError):
+                continue
+
+    @timed("gps.update")
+    def update(self, msg):
+        """Update the latest fix with a parsed sentence.
 
-    def __init__(self, com="COM4"):
-        """Initiator."""
-        self.m_serial = serial.Serial(com, 4800)
+        A GGA sentence without fix only records the quality 0, the void RMC sentences are ignored.
 
-    def get_latlon_from_gps(self):
+        :param msg: (pynmea2.NMEASentence) sentence
+        """
+        if msg.sentence_type == "GGA":
+            quality = int(msg.gps_qual or 0)
+            with self.lock:
+                if not quality:
+                    self.fix = self.fix._replace(quality=0)
+                    return
+                self.fix = self.fix._replace(
+                    latitude=msg.latitude, longitude=msg.longitude, timestamp=msg.timestamp, quality=quality
+                )
+                self.position_time = time.monotonic()
+            self.position_ready.set()
+        elif msg.sentence_type == "RMC" and msg.status == "A" and msg.spd_over_grnd is not None:
+            with self.lock:
+                self.fix = self.fix._replace(speed=float(msg.spd_over_grnd))
+                self.speed_time = time.monotonic()
+            self.speed_ready.set()
+
+    def stop(self):
+        """Stop reading the gps."""
+        self.stopped.set()
+
+    def age(self, updated_time):
+        """Seconds since an update.
+
+        :param updated_time: (float) monotonic time of the update, None if never updated
+        :return: (float) seconds, None if never updated
+        """
+        return None if updated_time is None else time.monotonic() - updated_time
+
+    def get_fix(self):
+        """Get the latest fix.
+
+        :return: (dict) latitude, longitude, timestamp, speed, quality & age in seconds of the position
+        """
+        with self.lock:
+            fix = self.fix._asdict()
+            fix["age"] = self.age(self.position_time)
+        fix["timestamp"] = str(fix["timestamp"]) if fix["timestamp"] is not None else None
+
+        return fix
+
+    def get_latlon_from_gps(self, timeout=settings.GPS_FIX_TIMEOUT):
         """Read the latlon&time from the gps.
 
-        :return: (list) lat, lon, datetime
+        :param timeout: (float) seconds to wait for the first fix
+        :return: (list) lat, lon, datetime or None without fix, or if the fix is older than max_age
         """
-        data_line = self.m_serial.readline().decode()
-        data = data_line.split(",")
-        if data[0] == "$GPGGA":
-            msg = pynmea2.parse(data_line)
-            try:
-                print(msg.latitude)
-                print(msg.longitude)
-                return {"latitude": msg.latitude, "longitude": msg.longitude, "timestamp": str(msg.timestamp)}
-            except:
-                return self.get_latlon_from_gps()
-        else:
-            return self.get_latlon_from_gps()
-
-    def get_speed_from_gps(self):
+        if not self.position_ready.wait(timeout):
+            return None
+        with self.lock:
+            fix, age = self.fix, self.age(self.position_time)
+        if not fix.quality or age > self.max_age:
+            return None
+
+        return {"latitude": fix.latitude, "longitude": fix.longitude, "timestamp": str(fix.timestamp)}
+
+    def get_speed_from_gps(self, timeout=settings.GPS_FIX_TIMEOUT):
         """Get speed from gps
 
-        :return: (float) speed
+        :param timeout: (float) seconds to wait for the first speed
+        :return: (float) speed in knots or None without speed, or if the speed is older than max_age
         """
-        data_line = self.m_serial.readline().decode()
-        data = data_line.split(",")
-        if data[0] == "$GPRMC":
+        if not self.speed_ready.wait(timeout):
+            return None
+        with self.lock:
+            speed, age = self.fix.speed, self.age(self.speed_time)
+        if age > self.max_age:
+            return None
+
+        return speed
+
+
+def read_fixes(path):
+    """Read the fixes of a NMEA log, without waiting between sentences.
+
+    GGA sentences only carry the time of day, the date comes from the RMC sentences. The fixes
+    before the first dated RMC are skipped, and a time of day going backwards moves to the next day.
+
+    :param path: (str) path of the NMEA log
+    :return: (generator) utc datetime & GPSFix of each GGA sentence with a fix, with the latest RMC speed
+    """
+    fix = GPSFix(None, None, None, None, 0)
+    date = None
+    last = None
+    with open(path, "rb") as nmea_log:
+        for data_line in nmea_log:
             try:
-                print(data[7])
-                return data[7]
-            except:
-                return self.get_speed_from_gps()
-        else:
-            return self.get_speed_from_gps()
+                msg = pynmea2.parse(data_line.decode(errors="ignore").strip())
+            except (pynmea2.ParseError, ValueError, AttributeError):
+                continue
+            if msg.sentence_type == "GGA" and int(msg.gps_qual or 0):
+                fix = fix._replace(
+                    latitude=msg.latitude, longitude=msg.longitude, timestamp=msg.timestamp, quality=int(msg.gps_qual)
+                )
+                if date is None:
+                    continue
+                fix_datetime = datetime.datetime.combine(date, msg.timestamp.replace(tzinfo=None))
+                if last is not None and fix_datetime < last:
+                    fix_datetime += datetime.timedelta(days=1)
+                    date = fix_datetime.date()
+                last = fix_datetime
+                yield fix_datetime, fix
+            elif msg.sentence_type == "RMC" and msg.status == "A":
+                if msg.datestamp is not None and (date is None or msg.datestamp > date):
+                    date = msg.datestamp
+                if msg.spd_over_grnd is not None:
+                    fix = fix._replace(speed=float(msg.spd_over_grnd))
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import os
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src import settings
+
+
+def latlon_to_tile(lat, lng, zoom=settings.TILE_ZOOM):
+    """Get the web mercator tile which contains a position.
+
+    :param lat: (float) latitude
+    :param lng: (float) longitude
+    :param zoom: (int) zoom of the tile
+    :return: (tuple) zoom, x, y
+    """
+    n = 2 ** zoom
+    lat_rad = math.radians(lat)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+
+    return zoom, min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_center(zoom, x, y):
+    """Get the position of the center of a tile.
+
+    :param zoom: (int) zoom of the tile
+    :param x: (int) x of the tile
+    :param y: (int) y of the tile
+    :return: (tuple) latitude, longitude
+    """
+    n = 2 ** zoom
+    lng = (x + 0.5) / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 0.5) / n))))
+
+    return lat, lng
+
+
+class TileCache(object):
+    """Cache of decoded images by tile, in memory (LRU) and on disk (size bounded)."""
+
+    def __init__(self, path=settings.TILE_CACHE_PATH, memory_size=settings.TILE_MEMORY_SIZE,
+                 disk_size=settings.TILE_DISK_SIZE):
+        """Initiator.
+
+        :param path: (str) directory of the disk cache
+        :param memory_size: (int) number of images kept in memory
+        :param disk_size: (int) number of bytes kept on disk
+        """
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+        self.tile_locks = dict()
+        os.makedirs(self.path, exist_ok=True)
+        self.disk_usage = sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+
+    def _tile_path(self, tile):
+        """Get the path of a tile on the disk.
+
+        :param tile: (tuple) zoom, x, y
+        :return: (str) path
+        """
+        return os.path.join(self.path, "{}_{}_{}.npy".format(*tile))
+
+    def _remember(self, tile, img):
+        """Put an image in the memory cache, and drop the least recently used ones.
+
+        :param tile: (tuple) zoom, x, y
+        :param img: (np.array) image
+        """
+        with self.lock:
+            self.memory[tile] = img
+            self.memory.move_to_end(tile)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Remove the least recently used images until the disk cache fits its size.
+
+        Must be called with the disk lock held.
+        """
+        entries = sorted(
+            (entry for entry in os.scandir(self.path) if entry.is_file() and not entry.name.endswith(".tmp.npy")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self.disk_usage <= self.disk_size:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.disk_usage -= size
+
+    def get(self, tile):
+        """Get the image of a tile from the cache.
+
+        :param tile: (tuple) zoom, x, y
+        :return: (np.array) image or None if the tile is not cached
+        """
+        with self.lock:
+            img = self.memory.get(tile)
+            if img is not None:
+                self.memory.move_to_end(tile)
+                return img
+        path = self._tile_path(tile)
+        try:
+            img = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        img.setflags(write=False)
+        self._remember(tile, img)
+
+        return img
+
+    def set(self, tile, img):
+        """Put the image of a tile in the cache.
+
+        :param tile: (tuple) zoom, x, y
+        :param img: (np.array) image
+        :return: (np.array) the cached image, read only
+        """
+        img = np.asarray(img)
+        img.setflags(write=False)
+        self._remember(tile, img)
+        path = self._tile_path(tile)
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, img)
+        with self.disk_lock:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.disk_usage += os.path.getsize(path) - previous_size
+            if self.disk_usage > self.disk_size:
+                self._evict_disk()
+
+        return img
+
+    def get_or_fetch(self, tile, fetch):
+        """Get the image of a tile, fetch it only once if it is not cached.
+
+        :param tile: (tuple) zoom, x, y
+        :param fetch: (callable) called with the tile to get the image on a miss
+        :return: (np.array) image
+        """
+        img = self.get(tile)
+        if img is not None:
+            return img
+        with self.lock:
+            tile_lock = self.tile_locks.setdefault(tile, threading.Lock())
+        with tile_lock:
+            img = self.get(tile)
+            if img is None:
+                img = self.set(tile, fetch(tile))
+        with self.lock:
+            self.tile_locks.pop(tile, None)
+
+        return img
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 import cv2
+import time
+import threading
+import collections
 
 from flask import Response
 import matplotlib.pyplot as plt
@@ -46,6 +49,111 @@ class VideoCamera(object):
         return Response(self.__gen__(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
+class CameraWorker(threading.Thread):
+    """Keep reading a camera in the background, the latest frames are kept in a ring buffer."""
+
+    MAX_FAILURES = 50
+
+    def __init__(self, source=0, buffer_size=4, fps=None):
+        """Initiator.
+
+        :param source: (int|str) camera id, or path of a video file used as a fake camera
+        :param buffer_size: (int) number of frames kept
+        :param fps: (float) reading rate, defaults to the rate of the video file for a file source
+        """
+        super().__init__(daemon=True)
+        self.source = int(source) if str(source).isdigit() else source
+        self.frames = collections.deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.fps = fps
+        self.jpeg = None
+        self.jpeg_frame_id = None
+        self.frame_id = 0
+
+    def _open(self):
+        """Open the camera or the video file.
+
+        :return: (cv2.VideoCapture) capture
+        """
+        video = cv2.VideoCapture(self.source)
+        if self.fps is None and isinstance(self.source, str):
+            self.fps = video.get(cv2.CAP_PROP_FPS) or 25
+
+        return video
+
+    def run(self):
+        """Read the frames until the worker is stopped.
+
+        A video file which can't be read MAX_FAILURES times in a row stops the worker, a camera
+        is released and opened again, so an unplugged camera is read again once plugged back.
+        """
+        video = self._open()
+        failures = 0
+        try:
+            while not self.stopped.is_set():
+                success, frame = video.read()
+                if not success:
+                    failures += 1
+                    if failures % self.MAX_FAILURES == 0:
+                        print("Camera", self.source, "failed to read", failures, "frames in a row")
+                        if isinstance(self.source, str):
+                            return
+                        video.release()
+                        video = self._open()
+                    if isinstance(self.source, str):
+                        video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if failures > 1 or not isinstance(self.source, str):
+                        time.sleep(0.1)
+                    continue
+                failures = 0
+                with self.lock:
+                    self.frame_id += 1
+                    self.frames.append((self.frame_id, frame))
+                self.ready.set()
+                if self.fps:
+                    time.sleep(1.0 / self.fps)
+        finally:
+            video.release()
+
+    def stop(self):
+        """Stop reading the camera."""
+        self.stopped.set()
+
+    def latest_frame(self, timeout=5):
+        """Get the most recent frame.
+
+        :param timeout: (float) seconds to wait for the first frame
+        :return: (np.array) image or None if there is no frame yet
+        """
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            return self.frames[-1][1]
+
+    def latest_jpeg(self, timeout=5):
+        """Get the most recent frame encoded in jpeg, each frame is encoded only once.
+
+        :param timeout: (float) seconds to wait for the first frame
+        :return: (bytes) jpeg or None if there is no frame yet
+        """
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            frame_id, frame = self.frames[-1]
+            if frame_id == self.jpeg_frame_id:
+                return self.jpeg
+        _, img_encoded = cv2.imencode('.jpg', frame)
+        jpeg = img_encoded.tobytes()
+        with self.lock:
+            if self.jpeg_frame_id is None or frame_id > self.jpeg_frame_id:
+                self.jpeg = jpeg
+                self.jpeg_frame_id = frame_id
+
+        return jpeg
+
+
 if __name__ == '__main__':
     obj = VideoCamera(0)
     frm = obj.get_frame()
@@ -2,6 +2,8 @@
 import os
 import cv2
 import json
+import math
+import pyproj
 import requests
 import datetime
 import operator
@@ -12,25 +14,40 @@ from googleplaces import GooglePlaces
 
 from src import settings
 from src.data.google_maps_images import GoogleImages
+from src.data.tile_cache import latlon_to_tile, tile_center
+from src.cache import PersistentTTLCache, TTLCache
+from src.features import sun
+from src.features.ratio_index import RatioIndex
+from src.metrics import timed
 from src.config.welcoming_sequence import WelcomingSequenceSettings
 
 
 class Featuring(object):
     """Module to generate data information."""
 
+    forest_lower = (180.0, 220.0, 170.0)
+    forest_upper = (210.0, 240.0, 230.0)
+    water_lower = (170.0, 200.0, 200.0)
+    water_upper = (180.0, 220.0, 255.0)
+    # google places answers at most this number of pois per nearby search, ordered by prominence
+    places_page_size = 20
+
     def __init__(self):
         """Initiator."""
         self.lng = 2.233111
         self.lat = 48.830446
         self.GOOGLE = GoogleImages()
+        self.ratio_index = RatioIndex()
         self.accuweather_key = settings.accuweather_key
         self.google_key = settings.google_key
+        if settings.google_places_url:
+            GooglePlaces.NEARBY_SEARCH_API_URL = settings.google_places_url
         self.google_poi = GooglePlaces(self.google_key)
+        self.weather_locations = PersistentTTLCache(settings.WEATHER_LOCATION_PATH, settings.WEATHER_LOCATION_TTL)
+        self.weather = TTLCache(settings.WEATHER_CACHE_SIZE, settings.WEATHER_CACHE_TTL)
+        self.GEOD = pyproj.Geod(ellps='WGS84')
+        self.pois = PersistentTTLCache(settings.POI_CACHE_PATH, settings.POI_CACHE_TTL)
         self.welcome = WelcomingSequenceSettings()
-        self.forest_lower = (180.0, 220.0, 170.0)
-        self.forest_upper = (210.0, 240.0, 230.0)
-        self.water_lower = (170.0, 200.0, 200.0)
-        self.water_upper = (180.0, 220.0, 255.0)
 
     def get_image_mask(self, image):
         """Select only the image area which contains forest or water.
@@ -62,6 +79,46 @@ class Featuring(object):
 
         return self._compute_ratio(**masks)
 
+    @classmethod
+    def get_ratios_from_images(cls, images):
+        """Get ratios of a stack of gps images in one vectorised pass.
+
+        Gives the same ratios as get_ratio_percent_forest_water_from_picture on each image, and
+        needs no instance so the batch jobs do not open the caches of the server.
+
+        :param images: (np.array) (N, H, W, 3) uint8 images
+        :return: (dict) np.array of the N ratios of each mask
+        """
+        images = np.asarray(images, dtype=np.uint8)
+        bounds = {
+            "forest_mask": (cls.forest_lower, cls.forest_upper),
+            "water_mask": (cls.water_lower, cls.water_upper)
+        }
+        ratios = dict()
+        for name, (lower, upper) in bounds.items():
+            # cv2.inRange keeps the pixels whose channels are all within [lower, upper]
+            mask = np.all((images >= np.asarray(lower)) & (images <= np.asarray(upper)), axis=-1)
+            pixels = mask.shape[1] * mask.shape[2]
+            ratios[name + "_ratio"] = np.round(np.count_nonzero(mask, axis=(1, 2)) / pixels, 3)
+
+        return ratios
+
+    @timed("featuring.get_ratios_from_latlon")
+    def get_ratios_from_latlon(self, lat, lon):
+        """Get ratios of the gps image, from the precomputed index or else from the image.
+
+        :param lat: (float) latitude
+        :param lon: (float) long
+        :return: (dict) ratios
+        """
+        ratios = self.ratio_index.get(latlon_to_tile(lat, lon, self.GOOGLE.tile_zoom))
+        if ratios is None:
+            image = self.GOOGLE.image_gps(lat, lon)
+            ratios = self.get_ratio_percent_forest_water_from_picture(image)
+
+        return ratios
+
+    @timed("featuring.get_song_from_latlon")
     def get_song_from_latlon(self, lat, lon):
         """Get song based on a gsp image.
 
@@ -69,8 +126,15 @@ class Featuring(object):
         :param lon: (float) long
         :return: (str) kind of song
         """
-        image = self.GOOGLE.image_gps(lat, lon)
-        ratios = self.get_ratio_percent_forest_water_from_picture(image)
+        return self.get_song_from_ratios(self.get_ratios_from_latlon(lat, lon))
+
+    @staticmethod
+    def get_song_from_ratios(ratios):
+        """Get song based on the forest & water ratios of a gps image.
+
+        :param ratios: (dict) ratios
+        :return: (str) kind of song
+        """
         max_key = max(ratios.items(), key=operator.itemgetter(1))[0]
         if ratios[max_key] > 0.1:
             return max_key.split("_")[0]
@@ -86,6 +150,25 @@ class Featuring(object):
         """
         return json.loads(requests.get(url).content)
 
+    @timed("featuring.get_weather_location_key")
+    def get_weather_location_key(self, lat, lng):
+        """Get the ACCUWEATHER location key of a position, cached by geo cell.
+
+        :param lat: (float) latitude
+        :param lng: (float) longitude
+        :return: (str) location key
+        """
+        zoom, x, y = latlon_to_tile(float(lat), float(lng), settings.WEATHER_CELL_ZOOM)
+
+        def search():
+            center_lat, center_lng = tile_center(zoom, x, y)
+            url = f"{settings.accuweather_url}/locations/v1/cities/geoposition/search" \
+                f"?apikey={self.accuweather_key}&q={center_lat}%2C%20{center_lng}"
+            return self.extract_value_from_web(url)['Key']
+
+        return self.weather_locations.get_or_set("{}/{}/{}".format(zoom, x, y), search)
+
+    @timed("featuring.get_weather_from_position")
     def get_weather_from_position(self, lat, lng):
         """Get weather from the position using ACCUWEATHER.
 
@@ -93,13 +176,25 @@ class Featuring(object):
         :param lng: (float) longitude
         :return: (float) weather
         """
-        base_url = "http://dataservice.accuweather.com"
-        url = f"{base_url}/locations/v1/cities/geoposition/search?apikey={self.accuweather_key}&q={lat}%2C%20{lng}"
-        key_id = self.extract_value_from_web(url)['Key']
-        url2 = f"{base_url}/currentconditions/v1/{key_id}?apikey={self.accuweather_key}"
+        key_id = self.get_weather_location_key(lat, lng)
+        url = f"{settings.accuweather_url}/currentconditions/v1/{key_id}?apikey={self.accuweather_key}"
+
+        return self.weather.get_or_set(key_id, lambda: self.extract_value_from_web(url)[0]["WeatherText"])
 
-        return self.extract_value_from_web(url2)[0]["WeatherText"]
+    @staticmethod
+    def get_sun_times_from_positions(lats, lngs, dates=None):
+        """Get the sunrise and sunset of several positions, computed locally.
+
+        :param lats: (np.array) latitudes
+        :param lngs: (np.array) longitudes
+        :param dates: (np.array) utc dates, today if None
+        :return: (dict) sunrise & sunset utc datetime64 arrays
+        """
+        sunrise, sunset = sun.sun_times(lats, lngs, dates)
 
+        return {'sunrise': sunrise, 'sunset': sunset}
+
+    @timed("featuring.get_sun_position_time_from_position")
     def get_sun_position_time_from_position(self, lat, lng):
         """Get the sunrise and sunset based on lat, long & time.
 
@@ -107,10 +202,9 @@ class Featuring(object):
         :param lng: (str) longitude
         :return: (dict) sunrise time & sunset time
         """
-        url = f'https://api.sunrise-sunset.org/json?lat={lat}&lng={lng}&formatted=0'
-        res = self.extract_value_from_web(url)
-        sunrise_time = res['results']['sunrise']
-        sunset_time = res['results']['sunset']
+        sun_times = self.get_sun_times_from_positions(float(lat), float(lng))
+        sunrise_time = sun.to_isoformat(sun_times['sunrise'])[0]
+        sunset_time = sun.to_isoformat(sun_times['sunset'])[0]
         now_time = datetime.datetime.now().isoformat()
 
         return {'now_time': now_time, 'sunrise': sunrise_time, 'sunset': sunset_time}
@@ -119,7 +213,7 @@ class Featuring(object):
     def _interesting_poi(poi):
         """Check if we have a interesting poi for our needs.
 
-        :arg poi: (google_places) poi
+        :arg poi: (dict) poi name|types|place_id
         :return: (bool) True if we've 1 or more good poi
         """
         list_poi = [
@@ -127,7 +221,62 @@ class Featuring(object):
             'neighborhood', 'park', 'school', 'gym', "church"
         ]
 
-        return bool(len(set(list_poi).intersection(set(poi.types))) > 0)
+        return bool(len(set(list_poi).intersection(set(poi["types"]))) > 0)
+
+    @timed("featuring.places_nearby_search")
+    def _search_pois(self, lat, lng, radius):
+        """Search the pois around a position with google places.
+
+        :param lat: (float) latitude
+        :param lng: (float) longitude
+        :param radius: (int) search radius in meters
+        :return: (list) poi dicts name|types|place_id|lat|lng
+        """
+        pois = self.google_poi.nearby_search(lat_lng={"lat": lat, "lng": lng}, radius=radius)
+
+        return [
+            {
+                "name": poi.name, "types": list(poi.types), "place_id": poi.place_id,
+                "lat": float(poi.geo_location["lat"]), "lng": float(poi.geo_location["lng"])
+            }
+            for poi in pois.places
+        ]
+
+    def _cell_half_diagonal(self, zoom, x, y):
+        """Distance between the center of a cell and its farthest corner.
+
+        :param zoom: (int) zoom of the cell
+        :param x: (int) x of the cell
+        :param y: (int) y of the cell
+        :return: (float) meters
+        """
+        center_lat, center_lng = tile_center(zoom, x, y)
+        corners = [tile_center(zoom, x + dx, y + dy) for dx in (-0.5, 0.5) for dy in (-0.5, 0.5)]
+
+        return max(self.GEOD.inv(center_lng, center_lat, lng, lat)[2] for lat, lng in corners)
+
+    def get_nearby_pois(self, lat, lng, radius):
+        """Get the pois around a position, cached by geo cell.
+
+        The search is made from the center of the cell, widened by its half diagonal so that it
+        covers the radius around every position of the cell. The cached pois are then filtered by
+        their distance to the real position. When the cell search is full, the wider circle may have
+        pushed out pois close to the position, so the search is made again from the position itself.
+
+        :param lat: (str) latitude
+        :param lng: (str) longitude
+        :param radius: (int) search radius in meters
+        :return: (list) poi dicts name|types|place_id|lat|lng within radius of the position
+        """
+        lat, lng = float(lat), float(lng)
+        zoom, x, y = latlon_to_tile(lat, lng, settings.POI_CELL_ZOOM)
+        search_radius = int(math.ceil(radius + self._cell_half_diagonal(zoom, x, y)))
+        key = "{}/{}/{}/{}".format(zoom, x, y, search_radius)
+        pois = self.pois.get_or_set(key, lambda: self._search_pois(*tile_center(zoom, x, y), radius=search_radius))
+        if len(pois) >= self.places_page_size:
+            pois = self._search_pois(lat, lng, radius)
+
+        return [poi for poi in pois if self.GEOD.inv(lng, lat, poi["lng"], poi["lat"])[2] <= radius]
 
     def get_poi_from_position(self, lat, lng):
         """Get the poi around me.
@@ -136,13 +285,9 @@ class Featuring(object):
         :param lng: (str) longitude
         :return: (dict) all poi.name|poi.types
         """
-        pois = self.google_poi.nearby_search(lat_lng={"lat": lat, "lng": lng}, radius=200)
-        res = {}
-        for poi in pois.places:
-            res[poi.name] = poi.types
-
-        return res
+        return {poi["name"]: poi["types"] for poi in self.get_nearby_pois(lat, lng, radius=200)}
 
+    @timed("featuring.get_poi_information_from_position")
     def get_poi_information_from_position(self, lat, lng):
         """Select poi based on rules, and get their names and info about them.
 
@@ -150,15 +295,10 @@ class Featuring(object):
         :param lng: (str) longitude
         :return: (dict) poi name|information
         """
-        pois = self.google_poi.nearby_search(lat_lng={"lat": lat, "lng": lng}, radius=150)
-        dict_poi = dict()
-        for poi in pois.places:
-            if self._interesting_poi(poi):
-                dict_poi[poi.name] = [poi.types, self.welcome.information_about_poi(poi)]
+        pois = [poi for poi in self.get_nearby_pois(lat, lng, radius=150) if self._interesting_poi(poi)]
+        informations = self.welcome.information_about_pois(pois)
 
-        if bool(dict_poi):
-            return dict_poi
-        return dict_poi
+        return {poi["name"]: [poi["types"], information] for poi, information in zip(pois, informations)}
 
 
 if __name__ == '__main__':
@@ -170,8 +310,8 @@ if __name__ == '__main__':
     song = obj.get_song_from_picture(np_img)
     print("song:", song)
     poi = obj.get_poi_from_position(obj.lat, obj.lng)
-    for point in poi.places:
-        print("poi:", point.name)
+    for name in poi:
+        print("poi:", name)
     poi = obj.get_poi_information_from_position(obj.lat, obj.lng)
     print("Information poi:", poi)
     sun_position = obj.get_sun_position_time_from_position(obj.lat, obj.lng)
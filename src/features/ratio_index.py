@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+import os
+import glob
+import argparse
+import threading
+
+import numpy as np
+from PIL import Image
+
+from src import settings
+from src.data.google_maps_images import GoogleImages
+from src.data.tile_cache import latlon_to_tile, tile_center
+
+
+def tile_key(zoom, x, y):
+    """Pack a tile into a single integer.
+
+    :param zoom: (int) zoom of the tile
+    :param x: (int) x of the tile
+    :param y: (int) y of the tile
+    :return: (int) key of the tile
+    """
+    return (zoom << 56) | (x << 28) | y
+
+
+def key_tile(key):
+    """Unpack the key of a tile.
+
+    :param key: (int) key of the tile
+    :return: (tuple) zoom, x, y
+    """
+    return (key >> 56) & 0xFF, (key >> 28) & 0xFFFFFFF, key & 0xFFFFFFF
+
+
+def corridor_tiles(points, zoom=settings.TILE_ZOOM, buffer=1):
+    """Get all the tiles along a route.
+
+    :param points: (list) (latitude, longitude) of the route
+    :param zoom: (int) zoom of the tiles
+    :param buffer: (int) number of tiles kept on each side of the route
+    :return: (list) sorted tiles (zoom, x, y)
+    """
+    route = list()
+    for (lat1, lng1), (lat2, lng2) in zip(points, points[1:] or points):
+        _, x1, y1 = latlon_to_tile(lat1, lng1, zoom)
+        _, x2, y2 = latlon_to_tile(lat2, lng2, zoom)
+        steps = max(abs(x2 - x1), abs(y2 - y1), 1) * 2
+        for step in range(steps + 1):
+            ratio = step / steps
+            route.append(latlon_to_tile(lat1 + (lat2 - lat1) * ratio, lng1 + (lng2 - lng1) * ratio, zoom))
+    tiles = set()
+    for _, x, y in route:
+        for dx in range(-buffer, buffer + 1):
+            for dy in range(-buffer, buffer + 1):
+                tiles.add((zoom, x + dx, y + dy))
+
+    return sorted(tiles)
+
+
+class RatioIndex(object):
+    """Forest & water ratios precomputed per map tile.
+
+    The index is a single file of (key, ratios) records, replaced atomically by the batch jobs and
+    reloaded by the server when its modification time changes.
+    """
+
+    dtype = np.dtype([("key", "<i8"), ("ratios", "<f4", (2,))])
+
+    def __init__(self, path=settings.RATIO_INDEX_PATH):
+        """Initiator.
+
+        :param path: (str) path prefix of the index file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        # rows by tile key and ratios, swapped together so a reader never mixes two versions
+        self.table = (dict(), np.zeros((0, 2), dtype=np.float32))
+        self.reload()
+
+    @staticmethod
+    def index_path(path):
+        """Path of the index records.
+
+        :param path: (str) path prefix of the index file
+        :return: (str) path
+        """
+        return path + "_index.npy"
+
+    def reload(self):
+        """Map the index again if the file was replaced since the last load."""
+        try:
+            mtime = os.stat(self.index_path(self.path)).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self.mtime:
+            return
+        with self.lock:
+            if mtime == self.mtime:
+                return
+            # the replaced file stays readable through the previous map until it is released
+            records = np.load(self.index_path(self.path), mmap_mode="r")
+            self.table = (dict(zip(records["key"].tolist(), range(len(records)))), records["ratios"])
+            self.mtime = mtime
+
+    def __len__(self):
+        """Number of indexed tiles."""
+        return len(self.table[0])
+
+    def get(self, tile):
+        """Get the ratios of a tile.
+
+        :param tile: (tuple) zoom, x, y
+        :return: (dict) ratios or None if the tile is not indexed
+        """
+        self.reload()
+        rows, values = self.table
+        row = rows.get(tile_key(*tile))
+        if row is None:
+            return None
+        forest_ratio, water_ratio = values[row]
+
+        return {"forest_mask_ratio": round(float(forest_ratio), 3), "water_mask_ratio": round(float(water_ratio), 3)}
+
+    @classmethod
+    def save(cls, path, tiles, ratios):
+        """Write an index, in a temporary file swapped in place so the readers never see a partial index.
+
+        :param path: (str) path prefix of the index file
+        :param tiles: (list) tiles (zoom, x, y)
+        :param ratios: (list) dict of ratios of each tile
+        """
+        records = np.zeros(len(tiles), dtype=cls.dtype)
+        records["key"] = [tile_key(*tile) for tile in tiles]
+        records["ratios"] = np.array(
+            [(ratio["forest_mask_ratio"], ratio["water_mask_ratio"]) for ratio in ratios], dtype=np.float32
+        ).reshape(-1, 2)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = cls.index_path(path) + ".tmp.npy"
+        np.save(tmp_path, records)
+        os.replace(tmp_path, cls.index_path(path))
+
+
+def _load_ratios(path):
+    """Read all the ratios of an index.
+
+    :param path: (str) path prefix of the index file
+    :return: (dict) tile key|ratios
+    """
+    rows, values = RatioIndex(path).table
+    indexed = dict()
+    for key, row in rows.items():
+        forest_ratio, water_ratio = values[row]
+        indexed[key] = {"forest_mask_ratio": float(forest_ratio), "water_mask_ratio": float(water_ratio)}
+
+    return indexed
+
+
+def _save_ratios(path, indexed):
+    """Write all the ratios of an index.
+
+    :param path: (str) path prefix of the index file
+    :param indexed: (dict) tile key|ratios
+    """
+    tiles = [key_tile(key) for key in sorted(indexed)]
+    RatioIndex.save(path, tiles, [indexed[tile_key(*tile)] for tile in tiles])
+
+
+def _batch_ratios(images):
+    """Compute the ratios of a batch of images.
+
+    :param images: (np.array) (N, H, W, 3) images
+    :return: (list) dict of ratios of each image
+    """
+    from src.features.build_features import Featuring
+
+    ratios = Featuring.get_ratios_from_images(images)
+
+    return [
+        {"forest_mask_ratio": float(forest_ratio), "water_mask_ratio": float(water_ratio)}
+        for forest_ratio, water_ratio in zip(ratios["forest_mask_ratio"], ratios["water_mask_ratio"])
+    ]
+
+
+def build_ratio_index(points, path=settings.RATIO_INDEX_PATH, buffer=1, google=None,
+                      batch_size=settings.RATIO_BATCH_SIZE):
+    """Compute the ratios of all the tiles along a route, merged with the existing index.
+
+    :param points: (list) (latitude, longitude) of the route
+    :param path: (str) path prefix of the index file
+    :param buffer: (int) number of tiles kept on each side of the route
+    :param google: (GoogleImages) used to get the images
+    :param batch_size: (int) number of images processed together
+    :return: (int) number of tiles in the index
+    """
+    google = google if google is not None else GoogleImages()
+    indexed = _load_ratios(path)
+    tiles = [
+        tile for tile in corridor_tiles(points, google.tile_zoom, buffer)
+        if tile_key(*tile) not in indexed
+    ]
+    for start in range(0, len(tiles), batch_size):
+        batch = tiles[start:start + batch_size]
+        images = np.stack([google.image_gps(*tile_center(*tile)) for tile in batch])
+        indexed.update(zip([tile_key(*tile) for tile in batch], _batch_ratios(images)))
+    _save_ratios(path, indexed)
+
+    return len(indexed)
+
+
+def backfill_ratio_index(image_paths, path=settings.RATIO_INDEX_PATH, batch_size=settings.RATIO_BATCH_SIZE):
+    """Compute the ratios of archived gps images, named latitude+longitude.jpg, into the index.
+
+    :param image_paths: (list) paths of the images
+    :param path: (str) path prefix of the index file
+    :param batch_size: (int) number of images processed together
+    :return: (int) number of tiles in the index
+    """
+    indexed = _load_ratios(path)
+    for start in range(0, len(image_paths), batch_size):
+        batches = dict()
+        for image_path in image_paths[start:start + batch_size]:
+            lat, lng = os.path.splitext(os.path.basename(image_path))[0].split("+")
+            tile = latlon_to_tile(float(lat), float(lng), settings.TILE_ZOOM)
+            image = np.asarray(Image.open(image_path).convert("RGB"))
+            keys, images = batches.setdefault(image.shape, (list(), list()))
+            keys.append(tile_key(*tile))
+            images.append(image)
+        for keys, images in batches.values():
+            indexed.update(zip(keys, _batch_ratios(np.stack(images))))
+    _save_ratios(path, indexed)
+
+    return len(indexed)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Precompute the forest & water ratios per map tile.")
+    arg_parser.add_argument("route", nargs="?", help="csv file with a latitude,longitude line per route point")
+    arg_parser.add_argument("--buffer", type=int, default=1, help="tiles kept on each side of the route")
+    arg_parser.add_argument("--backfill", action="store_true", help="index the archived gps images")
+    arg_parser.add_argument("--output", default=settings.RATIO_INDEX_PATH, help="path prefix of the index")
+    args = arg_parser.parse_args()
+    if args.backfill:
+        archived_paths = sorted(glob.glob(os.path.join(settings.IMAGE_GPS_PATH, "*.jpg")))
+        print("tiles indexed:", backfill_ratio_index(archived_paths, args.output))
+    if args.route:
+        route_points = np.atleast_2d(np.loadtxt(args.route, delimiter=",", usecols=(0, 1))).tolist()
+        print("tiles indexed:", build_ratio_index(route_points, args.output, args.buffer))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Sunrise and sunset computed locally with the NOAA sunrise equation, vectorised over positions and dates."""
+import datetime
+
+import numpy as np
+
+J2000 = np.datetime64("2000-01-01T12:00:00", "s")
+DAY = np.timedelta64(86400, "s")
+
+
+def _julian_to_datetime(julian):
+    """Convert days since J2000 to utc datetime64, NaT where julian is nan.
+
+    :param julian: (np.array) days since J2000
+    :return: (np.array) datetime64[s]
+    """
+    seconds = np.round(np.asarray(julian) * 86400)
+    times = np.full(seconds.shape, np.datetime64("NaT"), dtype="datetime64[s]")
+    valid = np.isfinite(seconds)
+    times[valid] = J2000 + seconds[valid].astype(np.int64).astype("timedelta64[s]")
+
+    return times
+
+
+def sun_times(lat, lng, dates=None):
+    """Sunrise and sunset of positions at dates.
+
+    The inputs are broadcast together, polar days and nights give NaT.
+
+    :param lat: (float|np.array) latitude in degrees
+    :param lng: (float|np.array) longitude in degrees, east positive
+    :param dates: (np.array) utc dates as datetime64 or str, today if None
+    :return: (np.array, np.array) utc sunrise and sunset as datetime64[s]
+    """
+    if dates is None:
+        dates = datetime.datetime.utcnow().date().isoformat()
+    days = np.asarray(dates, dtype="datetime64[D]")
+    lat, lng, days = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64), days)
+    n = (days - np.datetime64("2000-01-01", "D")).astype(np.float64)
+
+    mean_solar_noon = n - lng / 360
+    anomaly = np.radians((357.5291 + 0.98560028 * mean_solar_noon) % 360)
+    center = 1.9148 * np.sin(anomaly) + 0.02 * np.sin(2 * anomaly) + 0.0003 * np.sin(3 * anomaly)
+    ecliptic_longitude = np.radians((np.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = mean_solar_noon + 0.0053 * np.sin(anomaly) - 0.0069 * np.sin(2 * ecliptic_longitude)
+    sin_declination = np.sin(ecliptic_longitude) * np.sin(np.radians(23.4397))
+    cos_declination = np.cos(np.arcsin(sin_declination))
+
+    phi = np.radians(lat)
+    cos_hour_angle = (np.sin(np.radians(-0.833)) - np.sin(phi) * sin_declination) / (np.cos(phi) * cos_declination)
+    with np.errstate(invalid="ignore"):
+        hour_angle = np.degrees(np.arccos(np.where(np.abs(cos_hour_angle) <= 1, cos_hour_angle, np.nan)))
+
+    return _julian_to_datetime(transit - hour_angle / 360), _julian_to_datetime(transit + hour_angle / 360)
+
+
+def to_isoformat(times):
+    """Format utc datetime64 like sunrise-sunset.org, ex: 2019-02-06T07:13:15+00:00.
+
+    :param times: (np.array) datetime64
+    :return: (list) str, None where the time is NaT
+    """
+    return [
+        None if np.isnat(time) else str(time.astype("datetime64[s]")) + "+00:00"
+        for time in np.atleast_1d(times)
+    ]
@@ -1,21 +1,31 @@
 # -*- coding: utf-8 -*-
 import cv2
+import sys
 import time
 import pyproj
 import playsound
-import requests
+from pathlib import Path
 from GPSPhoto import gpsphoto
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+project_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_dir))
+
+from src.webservice.client import CLIENT
+
 
 class Runner(FileSystemEventHandler):
     """Get the GPS information about a picture."""
 
-    def __init__(self):
-        """Initiator."""
+    def __init__(self, client=CLIENT):
+        """Initiator.
+
+        :param client: (WebserviceClient) client of the webservice
+        """
         self.data = None
+        self.client = client
         self.GEOD = pyproj.Geod(ellps='WGS84')
 
     @staticmethod
@@ -85,39 +95,39 @@ class Runner(FileSystemEventHandler):
             #    json={"latitude": latitude, "longitude": longitude})
             # data["weather"] = response.json()["result"]
             data["weather"] = "Rainy"
-            response = requests.post(
-                'http://127.0.0.1:5000/api/features/get_ratio_mask_from_latlon',
+            response = self.client.post(
+                'features/get_ratio_mask_from_latlon',
                 json={"latitude": latitude, "longitude": longitude})
             data["ratios"] = response.json()["result"]
-            response = requests.post(
-                'http://127.0.0.1:5000/api/features/get_song_from_latlon',
+            response = self.client.post(
+                'features/get_song_from_latlon',
                 json={"latitude": latitude, "longitude": longitude})
             data["sound"] = response.json()["result"]
-            response = requests.post(
-                'http://127.0.0.1:5000/api/features/get_sun_position_from_latlon',
+            response = self.client.post(
+                'features/get_sun_position_from_latlon',
                 json={"latitude": latitude, "longitude": longitude})
             sun = response.json()["result"]
             data["sunrise"] = sun["sunrise"]
             data["sunset"] = sun["sunset"]
-            response = requests.post(
-                'http://127.0.0.1:5000/api/features/get_interesting_poi_information_from_latlon',
+            response = self.client.post(
+                'features/get_interesting_poi_information_from_latlon',
                 json={"latitude": latitude, "longitude": longitude})
             data["poi_information"] = response.json()['result']
             headers = {'content-type': 'image/jpeg'}
-            img_encoded = requests.post('http://127.0.0.1:5000/api/frame/get_camera_face')
-            response = requests.post(
-                'http://127.0.0.1:5000/api/mood/get_mood_from_image',
+            img_encoded = self.client.post('frame/get_camera_face')
+            response = self.client.post(
+                'mood/get_mood_from_image',
                 data=img_encoded.content, headers=headers)
             data["mood"] = response.json()["result"]
-            response = requests.post(
-                'http://127.0.0.1:5000/api/face/get_face_from_image',
+            response = self.client.post(
+                'face/get_face_from_image',
                 data=img_encoded.content, headers=headers)
             data["face"] = response.json()["result"]
             img = cv2.imread(event.src_path)
             img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
             _, img_encoded = cv2.imencode('.jpg', img)
-            response = requests.post(
-                'http://127.0.0.1:5000/api/landscape/get_landscape_from_image',
+            response = self.client.post(
+                'landscape/get_landscape_from_image',
                 data=img_encoded.tostring(), headers=headers)
             data["landscape"] = response.json()["result"]
             print(data)
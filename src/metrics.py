@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import time
+import functools
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+STAGE_SECONDS = Histogram(
+    "soundlandscape_stage_seconds", "Time spent in each stage of a tick", ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+STAGE_ERRORS = Counter("soundlandscape_stage_errors_total", "Exceptions raised by each stage", ["stage"])
+
+
+class timed(object):
+    """Record the latency and the errors of a stage, as a decorator or a context manager.
+
+    Usage: ``@timed("mood.predict")`` on a function, or ``with timed("mood.keras_predict"):``
+    """
+
+    def __init__(self, stage):
+        """Initiator.
+
+        :param stage: (str) name of the stage, ex: featuring.image_gps
+        """
+        self.stage = stage
+        self.histogram = STAGE_SECONDS.labels(stage=stage)
+        self.errors = STAGE_ERRORS.labels(stage=stage)
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.errors.inc()
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                self.errors.inc()
+                raise
+            finally:
+                self.histogram.observe(time.perf_counter() - start)
+
+        return wrapper
+
+
+def latest():
+    """Metrics in the prometheus text format.
+
+    :return: (bytes, str) body & content type
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
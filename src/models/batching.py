@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import time
+import queue
+import threading
+
+from concurrent.futures import Future
+
+
+class BatchPredictor(object):
+    """Group the predictions asked by concurrent callers to run them as one batch."""
+
+    def __init__(self, predict_batch, max_batch_size=16, max_wait=0.02):
+        """Initiator.
+
+        :param predict_batch: (callable) takes a list of inputs, returns the list of predictions
+        :param max_batch_size: (int) maximum number of inputs in a batch
+        :param max_wait: (float) seconds to wait for other inputs after the first one
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def predict(self, item, timeout=None):
+        """Predict one input, it will be batched with the inputs asked meanwhile.
+
+        :param item: input of the model
+        :param timeout: (float) seconds to wait for the prediction
+        :return: prediction
+        """
+        future = Future()
+        self.queue.put((item, future))
+
+        return future.result(timeout)
+
+    def _next_batch(self):
+        """Wait for the next batch of inputs.
+
+        :return: (list) (input, future)
+        """
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _predict_alone(self, item, future):
+        """Predict one input of a failed batch, so that only the bad inputs fail.
+
+        :param item: input of the model
+        :param future: (Future) future of the caller
+        """
+        try:
+            future.set_result(self.predict_batch([item])[0])
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run(self):
+        """Predict the batches until the process stops."""
+        while True:
+            batch = self._next_batch()
+            try:
+                predictions = self.predict_batch([item for item, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    for item, future in batch:
+                        self._predict_alone(item, future)
+                continue
+            for (_, future), prediction in zip(batch, predictions):
+                future.set_result(prediction)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from src import settings
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+class FaceIndex(object):
+    """Nearest neighbour search of a face encoding among the enrolled ones."""
+
+    def __init__(self, encodings, names, tolerance=settings.FACE_TOLERANCE,
+                 backend=settings.FACE_INDEX_BACKEND, unknown="unknow"):
+        """Initiator.
+
+        :param encodings: (list) 128 values encodings of the enrolled faces
+        :param names: (list) name of each encoding
+        :param tolerance: (float) maximum distance to recognize someone
+        :param backend: (str) exact, or faiss for an approximate search on large sets,
+            defaults to the ``face_index_backend`` environment variable
+        :param unknown: (str) name given when nobody is close enough
+        """
+        self.encodings = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, 128))
+        self.names = list(names)
+        self.tolerance = tolerance
+        self.unknown = unknown
+        self.squared_norms = np.einsum("ij,ij->i", self.encodings, self.encodings)
+        self.ann = None
+        if backend == "faiss":
+            if faiss is None:
+                raise ImportError("The faiss backend of the face index needs the faiss package")
+            self.ann = faiss.IndexHNSWFlat(self.encodings.shape[1], 32)
+            self.ann.add(self.encodings)
+        elif backend != "exact":
+            raise ValueError(f"Unknown face index backend: {backend}")
+
+    def __len__(self):
+        """Number of enrolled encodings."""
+        return len(self.names)
+
+    def search(self, queries):
+        """Find the nearest enrolled encoding of each query.
+
+        :param queries: (list) 128 values encodings
+        :return: (tuple) np.array of the indexes & np.array of the distances
+        """
+        queries = np.ascontiguousarray(np.asarray(queries, dtype=np.float32).reshape(-1, 128))
+        if not len(self) or not len(queries):
+            return np.full(len(queries), -1), np.full(len(queries), np.inf)
+        if self.ann is not None:
+            squared_distances, indexes = self.ann.search(queries, 1)
+            return indexes[:, 0], np.sqrt(np.maximum(squared_distances[:, 0], 0))
+        squared_distances = (
+            self.squared_norms[np.newaxis, :]
+            - 2 * queries.dot(self.encodings.T)
+            + np.einsum("ij,ij->i", queries, queries)[:, np.newaxis]
+        )
+        indexes = np.argmin(squared_distances, axis=1)
+        distances = np.sqrt(np.maximum(squared_distances[np.arange(len(queries)), indexes], 0))
+
+        return indexes, distances
+
+    def identify(self, queries):
+        """Get the name of the nearest enrolled face of each query.
+
+        :param queries: (list) 128 values encodings
+        :return: (tuple) (list) names & (list) distances
+        """
+        indexes, distances = self.search(queries)
+        names = [
+            self.names[index] if index >= 0 and distance <= self.tolerance else self.unknown
+            for index, distance in zip(indexes, distances)
+        ]
+
+        return names, [float(distance) for distance in distances]
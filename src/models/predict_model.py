@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 import cv2
 import pickle
+import threading
 
 from PIL import Image
 
 import face_recognition
 import numpy as np
 import keras
+import tensorflow as tf
 
 from src import settings
+from src.models.face_index import FaceIndex
+from src.metrics import timed
 
 
 class PredictFace(object):
@@ -18,32 +22,41 @@ class PredictFace(object):
         """Initiator."""
         self.face_encoding = pickle.load(open(settings.ENCO_MODEL_PATH, "rb"))
         self.face_name = pickle.load(open(settings.NAME_MODEL_PATH, "rb"))
+        self.index = FaceIndex(self.face_encoding, self.face_name)
 
-    def predict(self, image):
+    @timed("face.predict")
+    def predict(self, image, locations=None):
         """Predict the location and the name of people in the image.
 
         :param image: (np.array) image in gray
+        :param locations: (list) face locations already detected, detected here if None
         :return: (list) (list) names & locations
         """
         if not isinstance(image, np.ndarray):
             image = np.asarray(image, dtype=np.uint8)
         image.setflags(write=True)
         names = list()
-        locations = face_recognition.face_locations(image)
+        if locations is None:
+            with timed("face.face_locations"):
+                locations = face_recognition.face_locations(image)
         if not locations:
             locations = ["0"]
             names = ["adam"]
-        encodings = face_recognition.face_encodings(image, locations)
-        for encoding in encodings:
-            matches = face_recognition.compare_faces(self.face_encoding, encoding)
-            name = "unknow"
-            if True in matches:
-                first_match_index = matches.index(True)
-                name = self.face_name[first_match_index]
-            names.append(name)
+        with timed("face.face_encodings"):
+            encodings = face_recognition.face_encodings(image, locations)
+        names += self.identify(encodings)[0]
 
         return names, locations
 
+    @timed("face.identify")
+    def identify(self, encodings):
+        """Get the nearest enrolled identity of each face encoding.
+
+        :param encodings: (list) face encodings
+        :return: (tuple) (list) names & (list) distances
+        """
+        return self.index.identify(encodings)
+
 
 class PredictMood(object):
     """Module to predict the mood based on a picture."""
@@ -51,33 +64,41 @@ class PredictMood(object):
     def __init__(self):
         """Initiator."""
         self.model = keras.models.load_model(settings.MOOD_MODEL_PATH)
+        self.model._make_predict_function()
+        self.graph = tf.get_default_graph()
+        self.lock = threading.Lock()
         self.mood_classes = {
             0: 'angry', 1: 'disgust', 2: 'fear',
             3: 'happy', 4: 'neutral', 5: 'sad', 6: 'surprised'
         }
 
     @staticmethod
-    def crop_face(img):
+    def crop_face(img, locations=None):
         """Crop image to select only the face, but works only for the 1 person.
 
         :param img: (np.array) image
+        :param locations: (list) face locations already detected, detected here if None
         :return: (np.array) image cropped
         """
-        top, right, bottom, left = face_recognition.face_locations(img)[0]
+        if locations is None:
+            with timed("mood.face_locations"):
+                locations = face_recognition.face_locations(img)
+        top, right, bottom, left = locations[0]
 
         return img[top:bottom, left:right]
 
-    def process_img(self, img):
+    def process_img(self, img, locations=None):
         """Transform image to go through the deep architecture.
 
         :param img: (PIL.image) image
+        :param locations: (list) face locations already detected, detected here if None
         :return: (np.array) image processed
         """
         if not isinstance(img, np.ndarray):
             img = np.asarray(img, dtype=np.uint8)
         img.setflags(write=True)
         try:
-            crop_img = self.crop_face(img)
+            crop_img = self.crop_face(img, locations)
         except Exception as _:
             crop_img = img
         resized = cv2.resize(crop_img, (71, 71))
@@ -87,18 +108,53 @@ class PredictMood(object):
 
         return resized_gray_scale
 
-    def predict(self, img):
+    @timed("mood.predict")
+    def predict(self, img, locations=None):
         """Predict the mood based on a picture.
 
         :param img: (PIL.image) image
+        :param locations: (list) face locations already detected, detected here if None
         :return: (str) mood
         """
-        processed_img = self.process_img(img)
-        mood_index = np.argmax(self.model.predict(processed_img))
+        processed_img = self.process_img(img, locations)
+        with self.lock, self.graph.as_default(), timed("mood.keras_predict"):
+            mood_index = np.argmax(self.model.predict(processed_img))
 
         return self.mood_classes[mood_index]
 
 
+class FaceAnalysis(object):
+    """Detect the faces once per picture, then predict the names and the mood."""
+
+    def __init__(self, face_model, mood_model):
+        """Initiator.
+
+        :param face_model: (PredictFace) face model
+        :param mood_model: (PredictMood) mood model
+        """
+        self.face_model = face_model
+        self.mood_model = mood_model
+
+    def predict(self, image, locations=None):
+        """Predict the names and the mood of the people in the image.
+
+        :param image: (np.array) image
+        :param locations: (list) face locations already detected, detected here if None
+        :return: (dict) locations, face (names & locations) and mood
+        """
+        if not isinstance(image, np.ndarray):
+            image = np.asarray(image, dtype=np.uint8)
+        if locations is None:
+            with timed("face_analysis.face_locations"):
+                locations = face_recognition.face_locations(image)
+
+        return {
+            "locations": locations,
+            "face": self.face_model.predict(image, locations),
+            "mood": self.mood_model.predict(image, locations)
+        }
+
+
 class PredictLandscape(object):
     """Predict landscape based on a picture."""
 
@@ -109,6 +165,9 @@ class PredictLandscape(object):
         json_file.close()
         self.model = keras.models.model_from_json(loaded_model_json)
         self.model.load_weights(settings.LAND_MODEL_PATH)
+        self.model._make_predict_function()
+        self.graph = tf.get_default_graph()
+        self.lock = threading.Lock()
         self.landscape_classes = {
             0: "apartment", 1: "bridge", 2: "congestion", 3: "construction",
             4: "forest", 5: "highway", 6: "parking", 7: "promenade",
@@ -137,10 +196,21 @@ class PredictLandscape(object):
         :param img: (PIL.image) image
         :return: (str) landscape
         """
-        processed_img = self.process_img(img)
-        landscape_index = np.argmax(self.model.predict(processed_img))
+        return self.predict_batch([img])[0]
+
+    @timed("landscape.predict_batch")
+    def predict_batch(self, imgs):
+        """Predict the landscape of several pictures with a single forward pass.
+
+        :param imgs: (list) images
+        :return: (list) landscapes
+        """
+        processed_imgs = np.concatenate([self.process_img(img) for img in imgs])
+        with self.lock, self.graph.as_default(), timed("landscape.keras_predict"):
+            predictions = self.model.predict(processed_imgs)
+        landscape_indexes = np.argmax(predictions, axis=1)
 
-        return self.landscape_classes[landscape_index]
+        return [self.landscape_classes[landscape_index] for landscape_index in landscape_indexes]
 
 
 if __name__ == '__main__':
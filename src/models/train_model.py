@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import os
 import cv2
+import json
 import pickle
+import hashlib
+
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 
@@ -18,6 +22,31 @@ from keras.applications.mobilenet import preprocess_input
 from src import settings
 
 
+def file_hash(path):
+    """Hash the content of a file.
+
+    :param path: (str) path of the file
+    :return: (str) sha1 of the file
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def encode_face(path):
+    """Encode the face of an image, run by the enrolment workers.
+
+    :param path: (str) path of the image
+    :return: (np.array) encoding of the first face or None if there is no face
+    """
+    encodings = face_recognition.face_encodings(face_recognition.load_image_file(path))
+
+    return encodings[0] if encodings else None
+
+
 class TrainFaceDetector(object):
     """Module to predict the name & location of someone in a picture."""
 
@@ -25,21 +54,63 @@ class TrainFaceDetector(object):
         """Initiator."""
         self.face_name = list()
         self.face_encoding = list()
+        self.manifest = dict()
+
+    def load(self):
+        """Load the enrolled faces, the store is rebuilt if there is no manifest of the images."""
+        if not os.path.exists(settings.FACE_MANIFEST_PATH):
+            return
+        with open(settings.FACE_MANIFEST_PATH) as f:
+            self.manifest = json.load(f)
+        self.face_encoding = pickle.load(open(settings.ENCO_MODEL_PATH, "rb"))
+        self.face_name = pickle.load(open(settings.NAME_MODEL_PATH, "rb"))
+
+    def save(self):
+        """Save the enrolled faces and the manifest of the images."""
+        pickle.dump(self.face_encoding, open(settings.ENCO_MODEL_PATH, "wb"))
+        pickle.dump(self.face_name, open(settings.NAME_MODEL_PATH, "wb"))
+        pickle.dump(self, open(settings.FACE_MODEL_PATH, "wb"))
+        with open(settings.FACE_MANIFEST_PATH, "w") as f:
+            json.dump(self.manifest, f, indent=2)
 
-    def fit(self, images_paths):
+    def fit(self, images_paths, workers=settings.FACE_ENROLMENT_WORKERS):
         """Build an encoding for each people in the data directory.
 
+        Only the new or changed images are encoded, on a pool of processes. The entries of the
+        removed images, or of the images without a face anymore, are dropped and the encodings are
+        rebuilt from the remaining entries.
+
         :param images_paths: (list) paths of all the images
+        :param workers: (int) number of processes encoding the images
         """
-        for path in images_paths:
-            name = path.split(os.path.sep)[-1].split(".")[0]
-            vars()[name] = face_recognition.load_image_file(path)
-            vars()[name + "_encoding"] = face_recognition.face_encodings(vars()[name])[0]
-            self.face_encoding.append(vars()[name + "_encoding"])
-            self.face_name.append(name)
-        pickle.dump(self.face_encoding, open(settings.ENCO_MODEL_PATH, "wb"))
-        pickle.dump(self.face_name, open(settings.NAME_MODEL_PATH, "wb"))
-        pickle.dump(self, open(settings.FACE_MODEL_PATH, "wb"))
+        self.load()
+        hashes = {os.path.basename(path): file_hash(path) for path in images_paths}
+        enrolled = {
+            key: (self.face_encoding[entry["index"]], entry["hash"])
+            for key, entry in self.manifest.items() if key in hashes
+        }
+        paths = [
+            path for path in images_paths
+            if self.manifest.get(os.path.basename(path), {}).get("hash") != hashes[os.path.basename(path)]
+        ]
+        if paths:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                encodings = list(pool.map(encode_face, paths))
+            for path, encoding in zip(paths, encodings):
+                key = os.path.basename(path)
+                if encoding is None:
+                    print("No face found in", path)
+                    enrolled.pop(key, None)
+                    continue
+                enrolled[key] = (encoding, hashes[key])
+        if not paths and len(enrolled) == len(self.manifest):
+            return
+        self.face_encoding, self.face_name, self.manifest = list(), list(), dict()
+        for key, (encoding, image_hash) in sorted(enrolled.items()):
+            self.manifest[key] = {"index": len(self.face_encoding), "hash": image_hash}
+            self.face_encoding.append(encoding)
+            self.face_name.append(key.split(".")[0])
+        self.save()
 
     def predict(self, image):
         """Predict the location and the name of people in the image.
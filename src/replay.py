@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Replay a recorded trip through the runner pipeline, as fast as the webservice answers.
+
+A trip directory contains:
+
+- ``gps.nmea``: the NMEA log of the gps, with RMC sentences for the date
+- ``face/`` and ``front/``: jpeg frames of the cameras, named by their utc unix time in seconds,
+  ex: ``1549437195.2.jpg``
+- ``tiles/``: the map tiles of the route
+
+By default a webservice is started for the replay, with a copy of the tiles of the trip and the local
+stand-ins of google places, accuweather, spotify and wikipedia (see ``src.benchmark.stubs``), so a replay
+makes no network call and leaves the trip unchanged. ``--live`` replays against the webservice of the settings instead.
+
+Usage: ``python src/replay.py data/trips/paris --ticks 100 --output reports/replay.json``
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import argparse
+import shutil
+import calendar
+import tempfile
+
+from pathlib import Path
+
+project_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_dir))
+
+from src.runner import Runner
+from src.data.gps_data import read_fixes
+from src.webservice.client import CLIENT, WebserviceClient
+
+
+def unix_seconds(fix_datetime):
+    """Utc unix time in seconds.
+
+    :param fix_datetime: (datetime.datetime) naive utc datetime of a fix
+    :return: (float) seconds since the epoch
+    """
+    return calendar.timegm(fix_datetime.timetuple()) + fix_datetime.microsecond / 1e6
+
+
+class TripReplay(Runner):
+    """Drive the runner pipeline from a recorded trip instead of the gps, the cameras and the speakers."""
+
+    def __init__(self, trip_dir, client=CLIENT, aggregated=False):
+        """Initiator.
+
+        :param trip_dir: (str) directory of the trip
+        :param client: (WebserviceClient) client of the webservice
+        :param aggregated: (bool) get the features with the single tick api call
+        """
+        super().__init__(client=client, aggregated=aggregated, record_timings=True)
+        self.trip_dir = trip_dir
+        self.nmea_path = os.path.join(trip_dir, "gps.nmea")
+        self.frames = {name: self._list_frames(os.path.join(trip_dir, name)) for name in ["face", "front"]}
+
+    @staticmethod
+    def _list_frames(frame_dir):
+        """List the frames of a camera sorted by time.
+
+        :param frame_dir: (str) directory of the frames
+        :return: (list, list) times & paths
+        """
+        frames = sorted(
+            (float(os.path.splitext(filename)[0]), os.path.join(frame_dir, filename))
+            for filename in os.listdir(frame_dir) if filename.endswith(".jpg")
+        )
+        if not frames:
+            raise ValueError(f"No frame in {frame_dir}")
+
+        return [frame[0] for frame in frames], [frame[1] for frame in frames]
+
+    def frame_at(self, name, seconds):
+        """Read the latest frame of a camera at a time, the first one before it starts.
+
+        :param name: (str) face or front
+        :param seconds: (float) utc unix time in seconds
+        :return: (bytes) jpeg
+        """
+        times, paths = self.frames[name]
+        index = max(bisect.bisect_right(times, seconds) - 1, 0)
+        with open(paths[index], "rb") as frame:
+            return frame.read()
+
+    def replay_tasks(self, fix_datetime, fix):
+        """Build the tasks of one tick from a recorded fix, nothing is played.
+
+        :param fix_datetime: (datetime.datetime) utc datetime of the fix
+        :param fix: (GPSFix) fix of the tick
+        :return: (dict) name|(function, list of dependency names)
+        """
+        seconds = unix_seconds(fix_datetime)
+        tasks = self.quiet_tasks(self.aggregated_tick_tasks() if self.aggregated else self.tick_tasks())
+        tasks["gps"] = (lambda: {
+            "latitude": fix.latitude, "longitude": fix.longitude, "timestamp": str(fix.timestamp)
+        }, [])
+        tasks["speed"] = (lambda: fix.speed, [])
+        tasks["frame_face"] = (lambda: self.frame_at("face", seconds), [])
+        tasks["frame_front"] = (lambda: self.frame_at("front", seconds), [])
+
+        return tasks
+
+    def ticks(self, limit=None):
+        """Stream the trip through the pipeline.
+
+        :param limit: (int) maximum number of ticks, the whole trip if None
+        :return: (generator) data of each tick
+        """
+        for count, (fix_datetime, fix) in enumerate(read_fixes(self.nmea_path)):
+            if limit is not None and count >= limit:
+                return
+            yield self.api_calls(self.replay_tasks(fix_datetime, fix))
+
+    def report(self, ticks, duration):
+        """Throughput of each stage, from the timings recorded by the executor.
+
+        :param ticks: (int) number of replayed ticks
+        :param duration: (float) wall time of the replay in seconds
+        :return: (dict) ticks, duration, ticks_per_second & stages
+        """
+        stages = dict()
+        for name, timings in sorted(self.executor.timings.items()):
+            total = sum(timings)
+            stages[name] = {
+                "calls": len(timings),
+                "total_seconds": round(total, 4),
+                "mean_ms": round(1000 * total / len(timings), 3),
+                "calls_per_second": round(len(timings) / total, 3) if total else None
+            }
+
+        return {
+            "ticks": ticks,
+            "duration_seconds": round(duration, 4),
+            "ticks_per_second": round(ticks / duration, 3) if duration else None,
+            "stages": stages
+        }
+
+    def replay(self, limit=None):
+        """Replay the trip and measure it.
+
+        :param limit: (int) maximum number of ticks, the whole trip if None
+        :return: (list, dict) data of each tick & report
+        """
+        self.executor.timings.clear()
+        start = time.perf_counter()
+        results = list(self.ticks(limit))
+
+        return results, self.report(len(results), time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Replay a recorded trip through the runner pipeline.")
+    arg_parser.add_argument("trip_dir", help="directory of the trip")
+    arg_parser.add_argument("--ticks", type=int, default=None, help="maximum number of ticks")
+    arg_parser.add_argument("--aggregated", action="store_true", help="use the single tick api call")
+    arg_parser.add_argument("--output", default=None, help="json file of the report")
+    arg_parser.add_argument("--live", action="store_true", help="use the running webservice and the live apis")
+    arg_parser.add_argument("--port", type=int, default=5060, help="port of the replay webservice")
+    arg_parser.add_argument("--stub-port", type=int, default=5110, help="port of the stand-in apis")
+    args = arg_parser.parse_args()
+
+    if args.live:
+        _, trip_report = TripReplay(args.trip_dir, aggregated=args.aggregated).replay(args.ticks)
+    else:
+        from src.benchmark.run_benchmark import Benchmark
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            # the replay webservice caches in its work dir a copy of the tiles, the trip is never modified
+            trip_tiles = os.path.join(args.trip_dir, "tiles")
+            if os.path.isdir(trip_tiles):
+                shutil.copytree(trip_tiles, os.path.join(work_dir, "tiles"))
+            webservice = Benchmark(work_dir, args.port, args.stub_port)
+            try:
+                webservice.start()
+                client = WebserviceClient(base_url=webservice.base_url, retries=0)
+                _, trip_report = TripReplay(args.trip_dir, client, args.aggregated).replay(args.ticks)
+            finally:
+                webservice.stop()
+    print(json.dumps(trip_report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as report_file:
+            json.dump(trip_report, report_file, indent=2)
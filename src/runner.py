@@ -1,21 +1,108 @@
 # -*- coding: utf-8 -*-
+import sys
 import time
+import collections
+import cv2
 import playsound
 import pyproj
 import requests
 import pygame
 import numpy as np
 
-pygame.mixer.init()
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+project_dir = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_dir))
+
+from src import settings
+from src.webservice.client import CLIENT, WebserviceError
+
+
+class TickExecutor(object):
+    """Run the calls of one tick concurrently, only waiting on real dependencies."""
+
+    def __init__(self, max_workers=8, record=False):
+        """Initiator.
+
+        :param max_workers: (int) number of threads used for the calls
+        :param record: (bool) keep the duration of every call in timings, for the replays and benchmarks
+        """
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.record = record
+        self.timings = collections.defaultdict(list)
+
+    @staticmethod
+    def _ordered(tasks):
+        """Sort the tasks so that every task comes after its dependencies.
+
+        :param tasks: (dict) name|(function, list of dependency names)
+        :return: (list) task names in topological order
+        """
+        ordered = list()
+        remaining = dict(tasks)
+        while remaining:
+            ready = [name for name, (_, deps) in remaining.items() if all(d in ordered for d in deps)]
+            if not ready:
+                raise ValueError(f"Unresolvable dependencies between tasks: {sorted(remaining)}")
+            for name in ready:
+                ordered.append(name)
+                del remaining[name]
+
+        return ordered
+
+    def _call(self, name, function, dependencies):
+        """Wait for the dependencies then call the function with their results.
+
+        When recording, the time spent in the function, without the wait, is kept in timings.
+
+        :param name: (str) name of the task
+        :param function: (callable) the task
+        :param dependencies: (list) futures of the dependencies
+        :return: result of the task
+        """
+        args = [dependency.result() for dependency in dependencies]
+        if not self.record:
+            return function(*args)
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.timings[name].append(time.perf_counter() - start)
+
+    def run(self, tasks):
+        """Run all the tasks of a tick.
+
+        The tasks are submitted in topological order: the pool queue is FIFO, so every
+        dependency is already running or done when a task starts waiting on it.
+
+        :param tasks: (dict) name|(function, list of dependency names), the function
+            receives the results of its dependencies as positional arguments
+        :return: (dict) name|result
+        """
+        futures = dict()
+        for name in self._ordered(tasks):
+            function, deps = tasks[name]
+            futures[name] = self.pool.submit(self._call, name, function, [futures[d] for d in deps])
+
+        return {name: future.result() for name, future in futures.items()}
 
 
 class Runner(object):
     """Get the GPS information about a picture."""
 
-    def __init__(self):
-        """Initiator."""
+    def __init__(self, client=CLIENT, aggregated=False, record_timings=False):
+        """Initiator.
+
+        :param client: (WebserviceClient) client of the webservice
+        :param aggregated: (bool) get the features with the single tick api call
+        :param record_timings: (bool) keep the duration of every task, for the replays and benchmarks
+        """
         self.data = None
+        self.client = client
+        self.aggregated = aggregated
         self.GEOD = pyproj.Geod(ellps='WGS84')
+        self.executor = TickExecutor(record=record_timings)
         self.music_params = {
             'acousticness': 0.5, 'danceability': 0.5, 'energy': 0.5,
             'instrumentalness': 0.5, 'tempo': 80, 'country': 'FR',
@@ -85,8 +172,7 @@ class Runner(object):
 
         return (dist / (t2-t1)) * 3.6
 
-    @staticmethod
-    def get_features(url, params):
+    def get_features(self, url, params):
         """Get features from url.
 
         :param url: (str) url api
@@ -95,10 +181,9 @@ class Runner(object):
         """
         print(url)
 
-        return requests.post('http://127.0.0.1:5000/api/' + url, json=params).json()['result']
-g
-    @staticmethod
-    def get_img_features(url, data, headers):
+        return self.client.get_result(url, json=params)
+
+    def get_img_features(self, url, data, headers):
         """Get features from image.
 
         :param url: (str) url api
@@ -108,7 +193,7 @@ g
         """
         print(url)
 
-        return requests.post('http://127.0.0.1:5000/api/' + url, data=data, headers=headers).json()['result']
+        return self.client.get_result(url, data=data, headers=headers)
 
     @staticmethod
     def get_music(music):
@@ -117,15 +202,17 @@ g
         :param music: (dict) spotify results
         :return: (str) url
         """
-        lmusic = {"empty": "empty"}
+        lmusic = dict()
         for idx, t in enumerate(music["tracks"][::-1]):
             res = t["preview_url"]
             if res:
-                lmusic[t] = idx + 1
+                lmusic[res] = idx + 1
+        if not lmusic:
+            return None
 
         p = [x/sum(lmusic.values()) for x in lmusic.values()]
 
-        return np.random.choice(list(lmusic.keys()), 1, p=p)
+        return np.random.choice(list(lmusic.keys()), p=p)
 
     @staticmethod
     def play_music_from_url(url):
@@ -133,11 +220,21 @@ g
 
         :param url: (str) url
         """
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
         r = requests.get(url, stream=True)
         pygame.mixer.music.load(r.raw)
         # pygame.mixer.music.set_volume(0.1)
         pygame.mixer.music.play()
 
+    @staticmethod
+    def music_playing():
+        """Check if a music is playing.
+
+        :return: (bool) True while a preview is playing
+        """
+        return bool(pygame.mixer.get_init() and pygame.mixer.music.get_busy())
+
     def update_params(self, data):
         """Change dict value based on the env.
 
@@ -156,7 +253,7 @@ g
             self.music_params["energy"] = 0.7
             self.music_params["valence"] = 0.7
 
-        if data["speed"] < 30:
+        if not data["speed"] or data["speed"] < 30:
             self.music_params["tempo"] = 50
         else:
             self.music_params["tempo"] = int(data["speed"] * 2)
@@ -176,47 +273,181 @@ g
         # else:
         #     data["speed"] = 0
 
-    def api_calls(self):
-        """Call all the api.
+    def select_sounds(self, poi_information, sound):
+        """Select the sounds to play from the poi and the map, and play them.
 
-        :return: (dict) data
+        :param poi_information: (dict) poi name|information
+        :param sound: (str) sound deducted from the map
+        :return: (list) sound keys
         """
-        gps = requests.post('http://127.0.0.1:5000/api/gps/get_latlon').json()["result"]
-        params = {"latitude": gps["latitude"], "longitude": gps["longitude"]}
-        headers = {'content-type': 'image/jpeg'}
-        data = dict()
-        data["speed"] = requests.post('http://127.0.0.1:5000/api/gps/get_speed').json()["result"]
-        data["latitude"] = gps["latitude"]
-        data["longitude"] = gps["longitude"]
-        data["datetime"] = gps["timestamp"]
-        data["weather"] = "Sunny"
-        data["ratios"] = self.get_features("features/get_ratio_mask_from_latlon", params)
-        data["sound"] = self.get_features("features/get_song_from_latlon", params)
-        data["poi_information"] = self.get_features("features/get_interesting_poi_information_from_latlon", params)
-        img_encoded_face = requests.post('http://127.0.0.1:5000/api/frame/get_camera_face')
-        data["mood"] = self.get_img_features("mood/get_mood_from_image", img_encoded_face.content, headers)
-        data["face"] = self.get_img_features("face/get_face_from_image", img_encoded_face.content, headers)
-        img_encoded_front = requests.post('http://127.0.0.1:5000/api/frame/get_camera_front')
-        data["landscape"] = self.get_img_features("landscape/get_landscape_from_image", img_encoded_front.content, headers)
-        sounds = self.sound_to_play(data["poi_information"])
-        sounds = sounds + [data["sound"]]
+        sounds = self.sound_to_play(poi_information or {})
+        sounds = sounds + [sound]
         if sounds:
             self.play_sound(sounds)
+
+        return sounds
+
+    def get_driver_preferences(self, face):
+        """Get the genres liked by the driver in front of the camera.
+
+        :param face: (list) names & locations
+        :return: (list) seed genres
+        """
         try:
-            self.music_params["seed_genres"] = self.get_features("music/get_driver_preferences", data["face"][0][0])
+            return self.get_features("music/get_driver_preferences", face[0][0])
         except:
-            self.music_params["seed_genres"] = self.get_features("music/get_driver_preferences", "adam")
-        data["sounds"] = sounds
-        self.update_params(data)
+            return self.get_features("music/get_driver_preferences", "adam")
+
+    def recommend_music(self, seed_genres, speed, sounds):
+        """Update the music params and choose one of the recommendations.
+
+        :param seed_genres: (list) driver seed genres
+        :param speed: (float) speed of the car
+        :param sounds: (list) sounds played
+        :return: (str) url of the music, None without preview
+        """
+        self.music_params["seed_genres"] = seed_genres
+        self.update_params({"speed": speed, "sounds": sounds})
         music = self.get_features("music/get_recommendations", self.music_params)
-        data["music"] = self.get_music(music)
-        self.play_music_from_url(data["music"])
+
+        return self.get_music(music)
+
+    def select_music(self, seed_genres, speed, sounds):
+        """Update the music params, get the recommendations and play one of them.
+
+        :param seed_genres: (list) driver seed genres
+        :param speed: (float) speed of the car
+        :param sounds: (list) sounds played
+        :return: (str) url of the music
+        """
+        url = self.recommend_music(seed_genres, speed, sounds)
+        if url:
+            self.play_music_from_url(url)
         print(self.music_params["seed_genres"])
 
+        return url
+
+    def read_frame(self, url):
+        """Read the latest frame of a camera through the api.
+
+        :param url: (str) frame/get_camera_face or frame/get_camera_front
+        :return: (bytes) jpeg, None while the camera has no frame
+        """
+        response = self.client.post(url)
+        if response.status_code != 200:
+            print(url, "answered", response.status_code)
+            return None
+
+        return response.content
+
+    def read_gps(self, url):
+        """Read the gps through the api.
+
+        :param url: (str) gps/get_latlon or gps/get_speed
+        :return: result from api, None while the gps has no fix
+        """
+        try:
+            return self.client.get_result(url)
+        except WebserviceError as e:
+            print(e)
+            return None
+
+    def tick_tasks(self):
+        """Build the calls of one tick and their dependencies.
+
+        :return: (dict) name|(function, list of dependency names)
+        """
+        headers = {'content-type': 'image/jpeg'}
+
+        def located(url):
+            def get_located_features(gps):
+                if gps is None:
+                    return None
+                return self.get_features(url, {"latitude": gps["latitude"], "longitude": gps["longitude"]})
+            return get_located_features
+
+        return {
+            "gps": (lambda: self.read_gps("gps/get_latlon"), []),
+            "speed": (lambda: self.read_gps("gps/get_speed"), []),
+            "ratios": (located("features/get_ratio_mask_from_latlon"), ["gps"]),
+            "sound": (located("features/get_song_from_latlon"), ["gps"]),
+            "poi_information": (located("features/get_interesting_poi_information_from_latlon"), ["gps"]),
+            "frame_face": (lambda: self.read_frame("frame/get_camera_face"), []),
+            "frame_front": (lambda: self.read_frame("frame/get_camera_front"), []),
+            "face_analysis": (lambda frame: None if frame is None else self.get_img_features(
+                "face/get_face_analysis_from_image", frame, headers), ["frame_face"]),
+            "mood": (lambda analysis: analysis["mood"] if analysis else None, ["face_analysis"]),
+            "face": (lambda analysis: analysis["face"] if analysis else None, ["face_analysis"]),
+            "landscape": (lambda frame: None if frame is None else self.get_img_features(
+                "landscape/get_landscape_from_image", frame, headers), ["frame_front"]),
+            "sounds": (self.select_sounds, ["poi_information", "sound"]),
+            "seed_genres": (self.get_driver_preferences, ["face"]),
+            "music": (self.select_music, ["seed_genres", "speed", "sounds"]),
+        }
+
+    def aggregated_tick_tasks(self):
+        """Build the calls of one tick, the features are computed by a single call to the tick api.
+
+        :return: (dict) name|(function, list of dependency names)
+        """
+        def tick(gps, frame_face, frame_front):
+            if gps is None:
+                return dict()
+            params = {"latitude": gps["latitude"], "longitude": gps["longitude"]}
+            frames = {"face": frame_face, "front": frame_front}
+            files = {name: (name + ".jpg", frame, "image/jpeg") for name, frame in frames.items() if frame is not None}
+            return self.client.get_result("tick", data=params, files=files)
+
+        tasks = self.tick_tasks()
+        del tasks["face_analysis"]
+        tasks["tick"] = (tick, ["gps", "frame_face", "frame_front"])
+        for key in ["ratios", "sound", "poi_information", "mood", "face", "landscape"]:
+            tasks[key] = (lambda result, key=key: result.get(key), ["tick"])
+
+        return tasks
+
+    def quiet_tasks(self, tasks):
+        """Replace the tasks which play sounds or music, for the replays and the benchmarks.
+
+        :param tasks: (dict) tasks of a tick
+        :return: (dict) the same tasks, the sounds are selected and the music chosen without playing them
+        """
+        tasks = dict(tasks)
+        tasks["sounds"] = (lambda poi_information, sound: self.sound_to_play(poi_information or {}) + [sound],
+                           ["poi_information", "sound"])
+        tasks["music"] = (self.recommend_music, ["seed_genres", "speed", "sounds"])
+
+        return tasks
+
+    def api_calls(self, tasks=None):
+        """Call all the api, the independent calls are made concurrently.
+
+        :param tasks: (dict) tasks of the tick, the live ones if None
+        :return: (dict) data
+        """
+        if tasks is None:
+            tasks = self.aggregated_tick_tasks() if self.aggregated else self.tick_tasks()
+        results = self.executor.run(tasks)
+        data = dict()
+        gps = results["gps"] or dict()
+        data["speed"] = results["speed"]
+        data["latitude"] = gps.get("latitude")
+        data["longitude"] = gps.get("longitude")
+        data["datetime"] = gps.get("timestamp")
+        data["weather"] = "Sunny"
+        for key in ["ratios", "sound", "poi_information", "mood", "face", "landscape", "sounds", "music"]:
+            data[key] = results[key]
+
         return data
 
-    def run(self):
-        """Run the application."""
+    def run(self, event_driven=True):
+        """Run the application.
+
+        :param event_driven: (bool) refresh each input at its own cadence, else call all the api every 5 seconds
+        """
+        if event_driven:
+            EventScheduler(self).run()
+            return
         while True:
             print("check")
             data = self.api_calls()
@@ -224,6 +455,191 @@ g
             time.sleep(5)
 
 
+class EventScheduler(object):
+    """Refresh each input of the runner at its own cadence, the music only when its inputs change.
+
+    - gps and speed every gps_interval seconds
+    - ratios, sound and poi after moving features_distance meters
+    - face, mood and driver every face_interval seconds, or sooner when the face camera scene changes
+    - landscape every landscape_interval seconds, or sooner when the front camera scene changes
+    - sounds when the poi or the map sound change, music when the driver, the sounds or the speed
+      step change, or when the previous preview ended
+
+    Each refresh runs the same tasks as a tick, the inputs already known are reused. With an
+    aggregated runner, the map, poi, face and landscape features come from one tick api call, made
+    when any of them is due.
+    """
+
+    def __init__(self, runner, gps_interval=settings.RUNNER_GPS_INTERVAL,
+                 features_distance=settings.RUNNER_FEATURES_DISTANCE,
+                 frame_interval=settings.RUNNER_FRAME_INTERVAL,
+                 face_interval=settings.RUNNER_FACE_INTERVAL,
+                 landscape_interval=settings.RUNNER_LANDSCAPE_INTERVAL,
+                 scene_threshold=settings.RUNNER_SCENE_THRESHOLD,
+                 speed_step=settings.RUNNER_SPEED_STEP):
+        """Initiator.
+
+        :param runner: (Runner) runner whose tasks are scheduled
+        :param gps_interval: (float) seconds between two gps reads
+        :param features_distance: (float) meters to move before refreshing the map & poi features
+        :param frame_interval: (float) seconds between two scene change checks
+        :param face_interval: (float) maximum seconds between two face analyses
+        :param landscape_interval: (float) maximum seconds between two landscape predictions
+        :param scene_threshold: (float) mean gray level difference of a scene change, 0-255
+        :param speed_step: (float) speed difference which changes the music
+        """
+        self.runner = runner
+        self.gps_interval = gps_interval
+        self.features_distance = features_distance
+        self.frame_interval = frame_interval
+        self.analysis_intervals = {"frame_face": face_interval, "frame_front": landscape_interval}
+        self.analysis_tasks = {
+            "frame_face": ["face_analysis", "mood", "face", "seed_genres"],
+            "frame_front": ["landscape"]
+        }
+        self.scene_threshold = scene_threshold
+        self.speed_step = speed_step
+        self.state = dict()
+        self.refreshed = collections.defaultdict(lambda: float("-inf"))
+        self.feature_position = None
+        self.scenes = dict()
+        self.music_key = None
+        self.refreshes = collections.Counter()
+
+    def refresh(self, names, known=()):
+        """Run some tasks of a tick, with the results already known.
+
+        :param names: (list) tasks to run
+        :param known: (list) dependencies taken from the latest results
+        :return: (dict) name|result of the tasks run
+        """
+        tasks = self.runner.aggregated_tick_tasks() if self.runner.aggregated else self.runner.tick_tasks()
+        selected = {name: tasks[name] for name in names}
+        for name in known:
+            selected[name] = (lambda value=self.state[name]: value, [])
+        results = self.runner.executor.run(selected)
+        results = {name: results[name] for name in names}
+        self.state.update(results)
+        self.refreshes.update(names)
+
+        return results
+
+    def distance_moved(self, gps):
+        """Distance since the last refresh of the features.
+
+        :param gps: (dict) latest position
+        :return: (float) meters, inf before the first refresh
+        """
+        if self.feature_position is None:
+            return float("inf")
+        _, _, dist = self.runner.GEOD.inv(
+            self.feature_position["longitude"], self.feature_position["latitude"], gps["longitude"], gps["latitude"])
+
+        return dist
+
+    @staticmethod
+    def thumbnail(jpeg):
+        """Small gray version of a frame, compared to detect the scene changes.
+
+        :param jpeg: (bytes) frame
+        :return: (np.array) 32x24 gray image, None if there is no frame or it can't be decoded
+        """
+        if jpeg is None:
+            return None
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return None
+
+        return cv2.resize(img, (32, 24), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def scene_changed(self, camera, jpeg):
+        """Compare a frame with the frame of the last analysis.
+
+        :param camera: (str) frame_face or frame_front
+        :param jpeg: (bytes) latest frame
+        :return: (bool) True if the scene changed
+        """
+        scene = self.thumbnail(jpeg)
+        if scene is None:
+            return False
+        previous = self.scenes.get(camera)
+
+        return previous is None or float(np.abs(scene - previous).mean()) > self.scene_threshold
+
+    def step(self, now):
+        """Refresh the inputs which are due, then the sounds and the music if their inputs changed.
+
+        :param now: (float) monotonic time
+        :return: (set) names of the refreshed tasks
+        """
+        previous = dict(self.state)
+        refreshed = set()
+
+        if now - self.refreshed["gps"] >= self.gps_interval:
+            refreshed.update(self.refresh(["gps", "speed"]))
+            self.refreshed["gps"] = now
+        gps = self.state.get("gps")
+        features_due = bool(gps) and self.distance_moved(gps) >= self.features_distance
+
+        scenes_due = list()
+        if now - self.refreshed["frames"] >= self.frame_interval:
+            self.refreshed["frames"] = now
+            for camera in self.analysis_tasks:
+                jpeg = self.refresh([camera])[camera]
+                if self.scene_changed(camera, jpeg) or now - self.refreshed[camera] >= self.analysis_intervals[camera]:
+                    scenes_due.append(camera)
+
+        if self.runner.aggregated:
+            if gps and (features_due or scenes_due):
+                scenes_due = list(self.analysis_tasks)
+                refreshed.update(self.refresh(
+                    ["tick", "ratios", "sound", "poi_information", "mood", "face", "landscape", "seed_genres"],
+                    known=["gps", "frame_face", "frame_front"]
+                ))
+                self.feature_position = gps
+            else:
+                scenes_due = list()
+        else:
+            if features_due:
+                refreshed.update(self.refresh(["ratios", "sound", "poi_information"], known=["gps"]))
+                self.feature_position = gps
+            for camera in scenes_due:
+                refreshed.update(self.refresh(self.analysis_tasks[camera], known=[camera]))
+        for camera in scenes_due:
+            self.refreshed[camera] = now
+            self.scenes[camera] = self.thumbnail(self.state[camera])
+
+        if "sound" in self.state and any(
+                self.state.get(name) != previous.get(name) for name in ["poi_information", "sound"]):
+            refreshed.update(self.refresh(["sounds"], known=["poi_information", "sound"]))
+
+        if all(self.state.get(name) is not None for name in ["seed_genres", "speed", "sounds"]):
+            music_key = (
+                tuple(self.state["seed_genres"]), tuple(sorted(set(self.state["sounds"]))),
+                round(self.state["speed"] / self.speed_step)
+            )
+            preview_ended = self.state.get("music") is not None and not self.runner.music_playing()
+            if music_key != self.music_key or preview_ended:
+                refreshed.update(self.refresh(["music"], known=["seed_genres", "speed", "sounds"]))
+                self.music_key = music_key
+
+        return refreshed
+
+    def run(self):
+        """Run the scheduler, it wakes up at the fastest cadence."""
+        wake_up = min(self.gps_interval, self.frame_interval)
+        while True:
+            start = time.monotonic()
+            try:
+                refreshed = self.step(start)
+                if "music" in refreshed:
+                    print(self.state)
+                    print("refreshes:", dict(self.refreshes))
+            except Exception as e:
+                print("Refresh failed:", e)
+            time.sleep(max(wake_up - (time.monotonic() - start), 0))
+
+
 if __name__ == '__main__':
     print("Start ...")
     Runner().run()
@@ -9,7 +9,7 @@ load_dotenv(find_dotenv())
 
 PROJECT_DIR = Path(__file__).resolve().parents[1]
 IMAGE_STREET_PATH = os.path.join(PROJECT_DIR, "data", "raw", "streetview")
-IMAGE_GPS_PATH = os.path.join(PROJECT_DIR, "data", "raw", "gps")
+IMAGE_GPS_PATH = os.environ.get("image_gps_path", os.path.join(PROJECT_DIR, "data", "raw", "gps"))
 IMAGE_FACE_PATH = os.path.join(PROJECT_DIR, "data", "raw", "faces")
 
 MOOD_MODEL_PATH = os.path.join(PROJECT_DIR, "models", "mood_model.h5")
@@ -23,9 +23,94 @@ accuweather_key = os.environ.get("accuweathher_api_key")
 google_key = os.environ.get("google_key")
 spotify_id = os.environ.get("spotify_id")
 spotify_pwd = os.environ.get("spotify_pwd")
+spotify_api_url = os.environ.get("spotify_api_url")
+spotify_token_url = os.environ.get("spotify_token_url")
+google_maps_url = os.environ.get("google_maps_url", "https://maps.googleapis.com/maps/api/staticmap?")
+google_places_url = os.environ.get("google_places_url")
+wikipedia_api_url = os.environ.get("wikipedia_api_url")
+accuweather_url = os.environ.get("accuweather_url", "http://dataservice.accuweather.com")
 
 RULES_PATH = os.path.join(PROJECT_DIR, "references", "settings.csv")
 USER_PREFERENCES_PATH = os.path.join(PROJECT_DIR, "references", "user_preferences.json")
 MOOD_PREFERENCES_PATH = os.path.join(PROJECT_DIR, "references", "mood_preferences.json")
 
 lat_lon = os.path.join(PROJECT_DIR, "data", "raw", "settings.json")
+
+WEBSERVICE_URL = os.environ.get("webservice_url", "http://127.0.0.1:5000/api/")
+WEBSERVICE_CONNECT_TIMEOUT = float(os.environ.get("webservice_connect_timeout", 2))
+WEBSERVICE_READ_TIMEOUT = float(os.environ.get("webservice_read_timeout", 30))
+WEBSERVICE_RETRIES = int(os.environ.get("webservice_retries", 3))
+WEBSERVICE_BACKOFF = float(os.environ.get("webservice_backoff", 0.2))
+WEBSERVICE_POOL_SIZE = int(os.environ.get("webservice_pool_size", 16))
+
+TILE_CACHE_PATH = os.environ.get("tile_cache_path", os.path.join(PROJECT_DIR, "data", "interim", "tiles"))
+TILE_ZOOM = int(os.environ.get("tile_zoom", 18))
+TILE_MEMORY_SIZE = int(os.environ.get("tile_memory_size", 256))
+TILE_DISK_SIZE = int(os.environ.get("tile_disk_size", 512 * 1024 * 1024))
+
+RATIO_INDEX_PATH = os.environ.get("ratio_index_path", os.path.join(PROJECT_DIR, "data", "processed", "ratio_index"))
+RATIO_BATCH_SIZE = int(os.environ.get("ratio_batch_size", 64))
+
+LANDSCAPE_BATCH_SIZE = int(os.environ.get("landscape_batch_size", 16))
+LANDSCAPE_BATCH_WAIT = float(os.environ.get("landscape_batch_wait", 0.02))
+LANDSCAPE_MAX_IMAGES = int(os.environ.get("landscape_max_images", 64))
+
+FACE_TOLERANCE = float(os.environ.get("face_tolerance", 0.6))
+FACE_INDEX_BACKEND = os.environ.get("face_index_backend", "exact")
+
+FACE_MANIFEST_PATH = os.path.join(PROJECT_DIR, "models", "face_manifest.json")
+FACE_ENROLMENT_WORKERS = int(os.environ.get("face_enrolment_workers", os.cpu_count() or 1))
+
+CAMERA_FACE_SOURCE = os.environ.get("camera_face_source", "0")
+CAMERA_FRONT_SOURCE = os.environ.get("camera_front_source", "1")
+CAMERA_BUFFER_SIZE = int(os.environ.get("camera_buffer_size", 4))
+
+GPS_PORT = os.environ.get("gps_port", "COM5")
+GPS_REPLAY_PATH = os.environ.get("gps_replay_path")
+GPS_FIX_TIMEOUT = float(os.environ.get("gps_fix_timeout", 5))
+GPS_FIX_MAX_AGE = float(os.environ.get("gps_fix_max_age", 5))
+GPS_REPLAY_INTERVAL = float(os.environ.get("gps_replay_interval", 0.1))
+
+SERVER_HOST = os.environ.get("server_host", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("server_port", 5000))
+SERVER_THREADS = int(os.environ.get("server_threads", 8))
+RESOURCE_LIMITS = {
+    "landscape_model": int(os.environ.get("landscape_concurrency", LANDSCAPE_BATCH_SIZE)),
+    "mood_model": int(os.environ.get("mood_concurrency", 1)),
+    "face_model": int(os.environ.get("face_concurrency", 1)),
+    "sonic_road": int(os.environ.get("music_concurrency", 4)),
+    "featuring": int(os.environ.get("features_concurrency", 4)),
+}
+RESOURCE_LIMIT_TIMEOUT = float(os.environ.get("resource_limit_timeout", 30))
+WARM_UP_ON_START = os.environ.get("warm_up_on_start", "true").lower() == "true"
+
+SPOTIFY_TOKEN_TTL = float(os.environ.get("spotify_token_ttl", 3600))
+SPOTIFY_TOKEN_MARGIN = float(os.environ.get("spotify_token_margin", 60))
+SPOTIFY_CACHE_SIZE = int(os.environ.get("spotify_cache_size", 256))
+SPOTIFY_CACHE_TTL = float(os.environ.get("spotify_cache_ttl", 900))
+SPOTIFY_PARAM_STEP = float(os.environ.get("spotify_param_step", 0.05))
+SPOTIFY_TEMPO_STEP = float(os.environ.get("spotify_tempo_step", 5))
+PREFERENCES_RELOAD_INTERVAL = float(os.environ.get("preferences_reload_interval", 2))
+
+POI_CACHE_PATH = os.environ.get("poi_cache_path", os.path.join(PROJECT_DIR, "data", "interim", "poi_cache"))
+POI_CACHE_TTL = float(os.environ.get("poi_cache_ttl", 7 * 24 * 3600))
+POI_CELL_ZOOM = int(os.environ.get("poi_cell_zoom", 17))
+SUMMARY_CACHE_PATH = os.environ.get("summary_cache_path", os.path.join(PROJECT_DIR, "data", "interim", "summary_cache"))
+SUMMARY_CACHE_TTL = float(os.environ.get("summary_cache_ttl", 30 * 24 * 3600))
+SUMMARY_WORKERS = int(os.environ.get("summary_workers", 4))
+
+WEATHER_CELL_ZOOM = int(os.environ.get("weather_cell_zoom", 12))
+WEATHER_LOCATION_PATH = os.environ.get(
+    "weather_location_path", os.path.join(PROJECT_DIR, "data", "interim", "weather_locations")
+)
+WEATHER_LOCATION_TTL = float(os.environ.get("weather_location_ttl", 90 * 24 * 3600))
+WEATHER_CACHE_SIZE = int(os.environ.get("weather_cache_size", 256))
+WEATHER_CACHE_TTL = float(os.environ.get("weather_cache_ttl", 1800))
+
+RUNNER_GPS_INTERVAL = float(os.environ.get("runner_gps_interval", 1))
+RUNNER_FEATURES_DISTANCE = float(os.environ.get("runner_features_distance", 100))
+RUNNER_FRAME_INTERVAL = float(os.environ.get("runner_frame_interval", 2))
+RUNNER_FACE_INTERVAL = float(os.environ.get("runner_face_interval", 30))
+RUNNER_LANDSCAPE_INTERVAL = float(os.environ.get("runner_landscape_interval", 15))
+RUNNER_SCENE_THRESHOLD = float(os.environ.get("runner_scene_threshold", 12))
+RUNNER_SPEED_STEP = float(os.environ.get("runner_speed_step", 10))
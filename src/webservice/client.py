@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src import settings
+
+
+class WebserviceError(Exception):
+    """Error status returned by the webservice."""
+
+
+class WebserviceClient(object):
+    """Client of the webservice, keeps its connections alive between the calls."""
+
+    def __init__(self, base_url=settings.WEBSERVICE_URL,
+                 connect_timeout=settings.WEBSERVICE_CONNECT_TIMEOUT,
+                 read_timeout=settings.WEBSERVICE_READ_TIMEOUT,
+                 retries=settings.WEBSERVICE_RETRIES,
+                 backoff=settings.WEBSERVICE_BACKOFF,
+                 pool_size=settings.WEBSERVICE_POOL_SIZE):
+        """Initiator.
+
+        :param base_url: (str) url of the api, ex: http://127.0.0.1:5000/api/
+        :param connect_timeout: (float) seconds to wait for the connection
+        :param read_timeout: (float) seconds to wait for the response
+        :param retries: (int) number of retries on connection errors and gateway errors (502, 504)
+        :param backoff: (float) backoff factor between the retries
+        :param pool_size: (int) number of connections kept alive
+        """
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        # every route is a POST: only the errors raised before the route ran are retried,
+        # a read timeout or a 500 could replay a request the api already handled
+        retry = Retry(
+            total=retries, read=0, backoff_factor=backoff,
+            status_forcelist=(502, 504), method_whitelist=False, raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def post(self, url, **kwargs):
+        """Post a request to the api.
+
+        :param url: (str) url of the route, ex: gps/get_latlon
+        :return: (requests.Response) response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+
+        return self.session.post(self.base_url + url, **kwargs)
+
+    def get_result(self, url, **kwargs):
+        """Post a request to the api and read its result.
+
+        :param url: (str) url of the route, ex: gps/get_latlon
+        :return: result from api
+        :raise WebserviceError: if the api answers an error status
+        """
+        response = self.post(url, **kwargs)
+        if response.status_code >= 400:
+            raise WebserviceError(f"{url} answered {response.status_code}: {response.text[:200]}")
+
+        return response.json()["result"]
+
+    def close(self):
+        """Close all the connections."""
+        self.session.close()
+
+
+CLIENT = WebserviceClient()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import functools
+import threading
+
+from src import settings
+
+
+class Busy(Exception):
+    """Raised when a resource has no free slot before the timeout."""
+
+
+class ConcurrencyLimit(object):
+    """Limit the number of calls running at the same time on a resource (model, api...)."""
+
+    def __init__(self, name, limit, timeout):
+        """Initiator.
+
+        :param name: (str) name of the resource
+        :param limit: (int) maximum number of concurrent calls
+        :param timeout: (float) seconds to wait for a free slot
+        """
+        self.name = name
+        self.timeout = timeout
+        self.semaphore = threading.BoundedSemaphore(limit)
+
+    def __enter__(self):
+        """Take a slot, or raise Busy after the timeout."""
+        if not self.semaphore.acquire(timeout=self.timeout):
+            raise Busy(f"Too many concurrent calls on {self.name}")
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """Release the slot."""
+        self.semaphore.release()
+
+
+class Limited(object):
+    """Proxy of an object whose method calls take a slot of a concurrency limit.
+
+    The limit protects the resource whatever the route using it, ex: the tick and the face routes
+    share the slots of the face model.
+    """
+
+    def __init__(self, target, limit):
+        """Initiator.
+
+        :param target: object or Lazy object
+        :param limit: (ConcurrencyLimit) limit of the resource
+        """
+        self._target = target
+        self._limit = limit
+
+    def __getattr__(self, attribute):
+        """Forward the attributes to the object, the methods are called within the limit."""
+        value = getattr(self._target, attribute)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def limited(*args, **kwargs):
+            with self._limit:
+                return value(*args, **kwargs)
+
+        return limited
+
+
+def resource_limit(name):
+    """Get the concurrency limit configured for a resource.
+
+    :param name: (str) name of the resource in settings.RESOURCE_LIMITS
+    :return: (ConcurrencyLimit) limit
+    """
+    return ConcurrencyLimit(name, settings.RESOURCE_LIMITS[name], settings.RESOURCE_LIMIT_TIMEOUT)
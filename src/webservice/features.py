@@ -5,12 +5,11 @@ from flask import Blueprint, request
 
 from src import settings
 from src.webservice import status
-from src.features.build_features import Featuring
-from src.data.google_maps_images import GoogleImages
+from src.webservice.lazy import Lazy
+from src.webservice.concurrency import Limited, resource_limit
 
 FEATURES_APP = Blueprint('features_app', __name__)
-FEATURING = Featuring()
-GOOGLE = GoogleImages()
+FEATURING = Limited(Lazy("featuring", "src.features.build_features.Featuring"), resource_limit("featuring"))
 
 
 @FEATURES_APP.route("/api/features/get_lat_lon_time", methods=["POST", "GET"])
@@ -47,9 +46,8 @@ def get_ratio_mask_from_latlon():
     res = json.loads(request.data)
     lat = res["latitude"]
     lng = res["longitude"]
-    img = GOOGLE.image_gps(lat, lng)
 
-    return status.get_resource(FEATURING.get_ratio_percent_forest_water_from_picture(img))
+    return status.get_resource(FEATURING.get_ratios_from_latlon(lat, lng))
 
 
 @FEATURES_APP.route("/api/features/get_song_from_latlon", methods=["POST", "GET"])
@@ -82,7 +80,7 @@ def get_sun_position_from_latlon():
 def get_all_poi_from_latlon():
     """Get all poi around me.
 
-    :return: (google_place.places) Don't use it, return complex obj
+    :return: (dict) poi name|types
     """
     res = json.loads(request.data)
     lat = res["latitude"]
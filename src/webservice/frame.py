@@ -1,41 +1,63 @@
 # -*- coding: utf-8 -*-
-import base64
+from flask import Blueprint, request
 
-import cv2
+from src import settings
+from src.webservice import status, transport
+from src.webservice.lazy import Lazy
 
-from flask import Blueprint
+CAMERA_APP = Blueprint('camera_app', __name__)
 
-from src.data.webcam_images import VideoCamera
 
-CAMERA_APP = Blueprint('camera_app', __name__)
+def start_camera(source):
+    """Start reading a camera in the background.
+
+    :param source: (int|str) camera id or video file
+    :return: (CameraWorker) camera
+    """
+    from src.data.webcam_images import CameraWorker
+
+    camera = CameraWorker(source, settings.CAMERA_BUFFER_SIZE)
+    camera.start()
+
+    return camera
+
+
+CAMERA_FACE = Lazy("camera_face", start_camera, settings.CAMERA_FACE_SOURCE)
+CAMERA_FRONT = Lazy("camera_front", start_camera, settings.CAMERA_FRONT_SOURCE)
+
+
+def camera_response(camera, name):
+    """Build the response with the latest frame of a camera.
+
+    :param camera: (CameraWorker) camera
+    :param name: (str) name of the camera
+    :return: (flask.Response) jpeg or raw frame
+    """
+    if request.args.get("format") == "raw":
+        frame = camera.latest_frame()
+        if frame is not None:
+            return transport.frame_response(frame=frame)
+    else:
+        img_encoded = camera.latest_jpeg()
+        if img_encoded is not None:
+            return transport.frame_response(jpeg=img_encoded)
+
+    return status.not_found(f"No frame from the {name} camera")
 
 
 @CAMERA_APP.route("/api/frame/get_camera_face", methods=["POST", "GET"])
 def get_camera_face():
-    """Get img from face.
+    """Get img from face, in jpeg or as a raw frame with ?format=raw.
 
-    :return: (str) face image
+    :return: (bytes) face image
     """
-    CAMERA_FACE = VideoCamera(0)
-    frame = CAMERA_FACE.get_frame()
-    _, img_encoded = cv2.imencode('.jpg', frame)
-    CAMERA_FACE.__del__()
-
-    jpg_as_text = base64.b64encode(img_encoded)
+    return camera_response(CAMERA_FACE, "face")
 
-    return jpg_as_text
 
 @CAMERA_APP.route("/api/frame/get_camera_front", methods=["POST", "GET"])
 def get_camera_front():
-    """Get img from front.
+    """Get img from front, in jpeg or as a raw frame with ?format=raw.
 
-    :return: (str) front image
+    :return: (bytes) front image
     """
-    CAMERA_FRONT = VideoCamera(1)
-    frame = CAMERA_FRONT.get_frame()
-    _, img_encoded = cv2.imencode('.jpg', frame)
-    CAMERA_FRONT.__del__()
-
-    jpg_as_text = base64.b64encode(img_encoded)
-
-    return jpg_as_text
+    return camera_response(CAMERA_FRONT, "front")
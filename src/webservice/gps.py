@@ -1,11 +1,27 @@
 # -*- coding: utf-8 -*-
 from flask import Blueprint
 
+from src import settings
 from src.webservice import status
-from src.data.gps_data import GPSInfo
+from src.webservice.lazy import Lazy
 
 GPS_APP = Blueprint('gps_app', __name__)
-GPS = GPSInfo("COM5")
+
+
+def create_gps():
+    """Open the gps, or the replay of a NMEA log if one is set.
+
+    :return: (GPSInfo) gps
+    """
+    from src.data.gps_data import GPSInfo, NMEAReplay
+
+    if settings.GPS_REPLAY_PATH:
+        return GPSInfo(source=NMEAReplay(settings.GPS_REPLAY_PATH, settings.GPS_REPLAY_INTERVAL))
+
+    return GPSInfo(settings.GPS_PORT)
+
+
+GPS = Lazy("gps", create_gps)
 
 
 @GPS_APP.route("/api/gps/get_latlon", methods=["POST", "GET"])
@@ -14,7 +30,11 @@ def get_latlon():
 
     :return: (dict) latlon
     """
-    return status.get_resource(GPS.get_latlon_from_gps())
+    latlon = GPS.get_latlon_from_gps()
+    if latlon is None:
+        return status.unavailable("No recent gps fix")
+
+    return status.get_resource(latlon)
 
 
 @GPS_APP.route("/api/gps/get_speed", methods=["POST", "GET"])
@@ -23,4 +43,19 @@ def get_speed():
 
     :return: (dict) speed
     """
-    return status.get_resource(GPS.get_speed_from_gps())
+    speed = GPS.get_speed_from_gps()
+    if speed is None:
+        return status.unavailable("No recent gps speed")
+
+    return status.get_resource(speed)
+
+
+@GPS_APP.route("/api/gps/get_fix", methods=["POST", "GET"])
+def get_fix():
+    """Get the latest fix of the gps.
+
+    Answered even without fix, the quality and the age of the position tell if it is valid.
+
+    :return: (dict) latitude, longitude, timestamp, speed, quality & age
+    """
+    return status.get_resource(GPS.get_fix())
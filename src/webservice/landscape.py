@@ -1,28 +1,59 @@
 # -*- coding: utf-8 -*-
-import cv2
-
 from flask import Blueprint, request
 
-import numpy as np
-
-from src.webservice import status
-from src.models.predict_model import PredictLandscape
+from src import settings
+from src.webservice import status, transport
+from src.webservice.lazy import Lazy
+from src.webservice.concurrency import Limited, resource_limit
+from src.models.batching import BatchPredictor
 
 LANDSCAPE_APP = Blueprint('landscape_app', __name__)
-LANDSCAPE_MODEL = PredictLandscape()
+LANDSCAPE_MODEL = Lazy("landscape_model", "src.models.predict_model.PredictLandscape")
+# the limit counts the callers, not the batches, so it must let LANDSCAPE_BATCH_SIZE callers fill a batch
+LANDSCAPE_LIMIT = resource_limit("landscape_model")
+LANDSCAPE_BATCH = Limited(BatchPredictor(
+    lambda imgs: LANDSCAPE_MODEL.predict_batch(imgs), settings.LANDSCAPE_BATCH_SIZE, settings.LANDSCAPE_BATCH_WAIT
+), LANDSCAPE_LIMIT)
 
 
 @LANDSCAPE_APP.route("/api/landscape/get_landscape_from_image", methods=["POST", "GET"])
 def get_landscape_from_image():
-    """Get the landscape from a picture.
+    """Get the landscape from a picture, sent as jpeg or raw frame.
+
+    The concurrent requests are predicted together by the batch predictor.
 
     :return: (src) landscape
     """
-    try:
-        data = request.data
-    except Exception as _:
-        data = request.content
-    img = np.fromstring(data, np.uint8)
-    img = cv2.imdecode(img, cv2.IMREAD_COLOR)
-
-    return status.get_resource(LANDSCAPE_MODEL.predict(img))
+    img = transport.read_frame(request)
+
+    return status.get_resource(LANDSCAPE_BATCH.predict(img))
+
+
+@LANDSCAPE_APP.route("/api/landscape/get_landscapes_from_images", methods=["POST"])
+def get_landscapes_from_images():
+    """Get the landscapes of many pictures, sent as multipart jpeg or raw files named images.
+
+    At most LANDSCAPE_MAX_IMAGES pictures, predicted by batches of LANDSCAPE_BATCH_SIZE.
+
+    :return: (list) landscapes, in the order of the files, None for the files which can't be decoded
+    """
+    files = request.files.getlist("images")
+    if not files:
+        return status.bad_request("No images sent")
+    if len(files) > settings.LANDSCAPE_MAX_IMAGES:
+        return status.bad_request(f"Too many images, at most {settings.LANDSCAPE_MAX_IMAGES} per request")
+    imgs = dict()
+    for index, file in enumerate(files):
+        try:
+            imgs[index] = transport.read_file_frame(file)
+        except transport.InvalidFrame as e:
+            print("Image", index, "ignored:", e)
+    indexes = list(imgs)
+    landscapes = [None] * len(files)
+    with LANDSCAPE_LIMIT:
+        for start in range(0, len(indexes), settings.LANDSCAPE_BATCH_SIZE):
+            batch = indexes[start:start + settings.LANDSCAPE_BATCH_SIZE]
+            for index, landscape in zip(batch, LANDSCAPE_MODEL.predict_batch([imgs[index] for index in batch])):
+                landscapes[index] = landscape
+
+    return status.get_resource(landscapes)
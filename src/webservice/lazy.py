@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import time
+import importlib
+import threading
+from collections import OrderedDict
+
+LAZY_OBJECTS = OrderedDict()
+
+
+class Lazy(object):
+    """Create an object (model, device...) on first use, and record how long it took."""
+
+    def __init__(self, name, factory, *args, **kwargs):
+        """Initiator.
+
+        :param name: (str) name of the object in the startup profile
+        :param factory: (callable|str) class or function creating the object, or its dotted path
+            so that the module is imported only when the object is created
+        """
+        self._name = name
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+        self._duration = None
+        self._lock = threading.Lock()
+        LAZY_OBJECTS[name] = self
+
+    def get(self):
+        """Get the object, it is created by the first call.
+
+        :return: the object
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    factory = self._factory
+                    if isinstance(factory, str):
+                        module, attribute = factory.rsplit(".", 1)
+                        factory = getattr(importlib.import_module(module), attribute)
+                    self._instance = factory(*self._args, **self._kwargs)
+                    self._duration = time.perf_counter() - start
+
+        return self._instance
+
+    @property
+    def loaded(self):
+        """Whether the object is created."""
+        return self._instance is not None
+
+    def __getattr__(self, attribute):
+        """Forward the attributes to the object, creating it if needed."""
+        return getattr(self.get(), attribute)
+
+
+def startup_profile():
+    """Report how long each lazy object took to be created.
+
+    :return: (dict) name|seconds, None if the object is not created yet
+    """
+    return {name: lazy._duration for name, lazy in LAZY_OBJECTS.items()}
+
+
+def warm_up(names=None, background=False):
+    """Create the lazy objects before their first use.
+
+    :param names: (list) names of the objects, all of them if None
+    :param background: (bool) create them in a background thread
+    :return: (threading.Thread) the thread if background, else None
+    """
+    def create_all():
+        for name in names or list(LAZY_OBJECTS):
+            try:
+                LAZY_OBJECTS[name].get()
+            except Exception as e:
+                print("Warm up of", name, "failed:", e)
+
+    if background:
+        thread = threading.Thread(target=create_all, daemon=True)
+        thread.start()
+        return thread
+    create_all()
+
+    return None
@@ -3,11 +3,12 @@ import json
 
 from flask import Blueprint, request
 
-from src.config.sonic_road import SonicRoadSettings
 from src.webservice import status
+from src.webservice.lazy import Lazy
+from src.webservice.concurrency import Limited, resource_limit
 
 MUSIC_APP = Blueprint('music_app', __name__)
-SONICROAD = SonicRoadSettings()
+SONICROAD = Limited(Lazy("sonic_road", "src.config.sonic_road.SonicRoadSettings"), resource_limit("sonic_road"))
 
 
 @MUSIC_APP.route("/api/music/get_params", methods=["POST", "GET"])
@@ -41,6 +42,17 @@ def update_params():
     return status.get_resource(SONICROAD.add_config_dict(new_params))
 
 
+@MUSIC_APP.route("/api/music/get_combined_params", methods=["POST", "GET"])
+def get_combined_params():
+    """Get the params of the current conditions, ex: {"conditions": {"meteo": "sunny"}, "speed": 50}.
+
+    :return: (dict) spotify target params
+    """
+    res = json.loads(request.data)
+
+    return status.get_resource(SONICROAD.combine_params(res["conditions"], res.get("speed")))
+
+
 @MUSIC_APP.route("/api/music/get_day_time", methods=["POST", "GET"])
 def get_day_time():
     """Get category over (among night, afternoon, morning, sunset, sunrise).
@@ -1,31 +1,33 @@
 # -*- coding: utf-8 -*-
-import base64
-import json
-
-import cv2
-
 from flask import Blueprint, request
 
-import numpy as np
-
-from src.webservice import status
-from src.models.predict_model import PredictFace
+from src.webservice import status, transport
+from src.webservice.mood import MOOD_MODEL
+from src.webservice.lazy import Lazy
+from src.webservice.concurrency import Limited, resource_limit
 
 FACE_APP = Blueprint('face_app', __name__)
-FACE_MODEL = PredictFace()
+FACE_MODEL = Limited(Lazy("face_model", "src.models.predict_model.PredictFace"), resource_limit("face_model"))
+FACE_ANALYSIS = Lazy("face_analysis", "src.models.predict_model.FaceAnalysis", FACE_MODEL, MOOD_MODEL)
 
 
 @FACE_APP.route("/api/face/get_face_from_image", methods=["POST", "GET"])
 def get_face_from_image():
-    """Get the face'name from a picture.
+    """Get the face'name from a picture, sent as jpeg or raw frame.
 
     :return: (src) face'name
     """
-    try:
-        data = base64.b64decode(json.loads(request.data.decode())["data"])
-    except Exception as _:
-        data = base64.b64decode(json.loads(request.content.decode())["data"])
-    img = np.fromstring(data, np.uint8)
-    img = cv2.imdecode(img, cv2.IMREAD_COLOR)
-
-    return status.get_resource(FACE_MODEL.predict(img))
+    img = transport.read_frame(request)
+
+    return status.get_resource(FACE_MODEL.predict(img, transport.read_locations(request)))
+
+
+@FACE_APP.route("/api/face/get_face_analysis_from_image", methods=["POST", "GET"])
+def get_face_analysis_from_image():
+    """Get the face locations, the face'name and the mood from a picture, detecting the faces once.
+
+    :return: (dict) locations, face & mood
+    """
+    img = transport.read_frame(request)
+
+    return status.get_resource(FACE_ANALYSIS.predict(img, transport.read_locations(request)))
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import sys
+import time
 from pathlib import Path
 
 import flask
 from flask_cors import CORS
 
+START_TIME = time.perf_counter()
 project_dir = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(project_dir))
 
@@ -15,6 +17,12 @@ from src.webservice.recognition import FACE_APP
 from src.webservice.frame import CAMERA_APP
 from src.webservice.music import MUSIC_APP
 from src.webservice.gps import GPS_APP
+from src.webservice.tick import TICK_APP
+from src.webservice.concurrency import Busy
+from src.webservice.transport import InvalidFrame
+from src.webservice.lazy import startup_profile, warm_up
+from src.webservice import status
+from src import settings, metrics
 
 
 app = flask.Flask(__name__)
@@ -27,6 +35,82 @@ app.register_blueprint(FEATURES_APP)
 app.register_blueprint(CAMERA_APP)
 app.register_blueprint(MUSIC_APP)
 app.register_blueprint(GPS_APP)
+app.register_blueprint(TICK_APP)
+
+STARTUP_DURATION = time.perf_counter() - START_TIME
+
+
+@app.errorhandler(Busy)
+def overloaded(error):
+    """Answer a model or an api without a free slot as temporarily unavailable.
+
+    :param error: (Busy) error
+    :return: (flask.Response) 503 response
+    """
+    return status.unavailable(str(error))
+
+
+@app.errorhandler(InvalidFrame)
+def invalid_frame(error):
+    """Answer a frame which can't be decoded as a bad request.
+
+    :param error: (InvalidFrame) error
+    :return: (flask.Response) 400 response
+    """
+    return status.bad_request(str(error))
+
+
+@app.route("/api/server/startup_profile", methods=["POST", "GET"])
+def get_startup_profile():
+    """Get how long the server and each model or device took to start.
+
+    :return: (dict) startup seconds & seconds per object, None if not created yet
+    """
+    return status.get_resource({"startup": STARTUP_DURATION, "objects": startup_profile()})
+
+
+@app.route("/api/server/warm_up", methods=["POST", "GET"])
+def warm_up_objects():
+    """Create the models and devices in the background before their first use.
+
+    :return: (dict) startup profile at the time of the call
+    """
+    warm_up(background=True)
+
+    return status.get_resource({"startup": STARTUP_DURATION, "objects": startup_profile()})
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Get the latency histograms and the call counts of each stage, in the prometheus text format.
+
+    :return: (flask.Response) metrics
+    """
+    body, content_type = metrics.latest()
+
+    return flask.Response(body, content_type=content_type)
+
+
+def serve(host=settings.SERVER_HOST, port=settings.SERVER_PORT, threads=settings.SERVER_THREADS):
+    """Serve the application in production with waitress, one process and a pool of threads.
+
+    The models are loaded once and shared between the threads, each model is protected by its
+    concurrency limit whatever the route using it.
+
+    :param host: (str) host
+    :param port: (int) port
+    :param threads: (int) number of threads handling the requests
+    """
+    import waitress
+
+    waitress.serve(app, host=host, port=port, threads=threads)
+
 
 if __name__ == '__main__':
-    app.run(host="127.0.0.1", port=5000, threaded=False)
+    print(f"Server started in {STARTUP_DURATION:.3f}s")
+    if settings.WARM_UP_ON_START:
+        warm_up(background=True)
+    if "--production" in sys.argv:
+        serve()
+    else:
+        app.run(host=settings.SERVER_HOST, port=settings.SERVER_PORT, threaded=False)
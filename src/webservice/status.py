@@ -52,6 +52,16 @@ def processing(data):
     return flask.make_response(flask.jsonify(body), 102)
 
 
+def unavailable(error, metainfo={}):
+    body = {
+        "success": False,
+        "error": error
+    }
+    body.update(metainfo)
+
+    return flask.make_response(flask.jsonify(body), 503)
+
+
 def busy(data):
     body = {
         "success": False,
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from flask import Blueprint, request
+
+from src.webservice import status, transport
+from src.webservice.features import FEATURING
+from src.webservice.landscape import LANDSCAPE_BATCH
+from src.webservice.recognition import FACE_ANALYSIS
+
+TICK_APP = Blueprint('tick_app', __name__)
+
+
+@TICK_APP.route("/api/tick", methods=["POST"])
+def tick():
+    """Get all the features of one tick in a single call.
+
+    The body is a multipart form with the latitude, the longitude and optionally the face &
+    front frames as jpeg or raw files.
+
+    :return: (dict) ratios, sound, poi_information, mood, face & landscape
+    """
+    lat = float(request.form["latitude"])
+    lng = float(request.form["longitude"])
+    ratios = FEATURING.get_ratios_from_latlon(lat, lng)
+    result = {
+        "ratios": ratios,
+        "sound": FEATURING.get_song_from_ratios(ratios),
+        "poi_information": FEATURING.get_poi_information_from_position(lat, lng)
+    }
+    if "face" in request.files:
+        analysis = FACE_ANALYSIS.predict(transport.read_file_frame(request.files["face"]))
+        result["mood"] = analysis["mood"]
+        result["face"] = analysis["face"]
+    if "front" in request.files:
+        result["landscape"] = LANDSCAPE_BATCH.predict(transport.read_file_frame(request.files["front"]))
+
+    return status.get_resource(result)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import base64
+import struct
+
+import cv2
+import flask
+
+import numpy as np
+
+JPEG_CONTENT_TYPE = "image/jpeg"
+RAW_CONTENT_TYPE = "application/x-ndarray"
+RAW_MAGIC = b"SLF1"
+RAW_HEADER = struct.Struct("!4sHHB")
+
+
+class InvalidFrame(ValueError):
+    """Raised when the body of a request can't be decoded as a frame."""
+
+
+def encode_raw(frame):
+    """Encode a frame as a raw uint8 buffer with a small header.
+
+    The header is the magic SLF1, the height, the width and the channels of the frame.
+
+    :param frame: (np.array) uint8 image
+    :return: (bytes) raw frame
+    """
+    frame = np.ascontiguousarray(frame, dtype=np.uint8)
+    height, width = frame.shape[:2]
+    channels = frame.shape[2] if frame.ndim == 3 else 1
+
+    return RAW_HEADER.pack(RAW_MAGIC, height, width, channels) + frame.tobytes()
+
+
+def decode_frame(data, content_type=JPEG_CONTENT_TYPE):
+    """Decode a frame, exactly once.
+
+    :param data: (bytes) jpeg or raw frame
+    :param content_type: (str) image/jpeg or application/x-ndarray
+    :return: (np.array) image
+    :raise InvalidFrame: if the data is empty, truncated or not an image
+    """
+    if content_type == RAW_CONTENT_TYPE:
+        try:
+            magic, height, width, channels = RAW_HEADER.unpack_from(data)
+            if magic != RAW_MAGIC:
+                raise InvalidFrame("Not a raw frame")
+            frame = np.frombuffer(data, np.uint8, height * width * channels, RAW_HEADER.size)
+        except (struct.error, ValueError) as e:
+            raise InvalidFrame(f"Invalid raw frame: {e}")
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        return frame.reshape(shape).copy()
+
+    frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) if data else None
+    if frame is None:
+        raise InvalidFrame(f"The body can't be decoded as {content_type}")
+
+    return frame
+
+
+def frame_response(jpeg=None, frame=None):
+    """Build the response of a frame, jpeg bytes or raw frame.
+
+    :param jpeg: (bytes) jpeg frame
+    :param frame: (np.array) image, sent raw
+    :return: (flask.Response) binary response
+    """
+    if frame is not None:
+        return flask.Response(encode_raw(frame), mimetype=RAW_CONTENT_TYPE)
+
+    return flask.Response(jpeg, mimetype=JPEG_CONTENT_TYPE)
+
+
+def read_frame(request):
+    """Read the frame of a request, sent as jpeg or raw frame in the body.
+
+    The legacy json body {"data": base64 jpeg} is still accepted.
+
+    :param request: (flask.Request) request
+    :return: (np.array) image
+    """
+    if request.mimetype == "application/json":
+        return decode_frame(base64.b64decode(json.loads(request.get_data())["data"]))
+
+    return decode_frame(request.get_data(), request.mimetype)
+
+
+def read_file_frame(file):
+    """Read a frame sent as a multipart file.
+
+    :param file: (werkzeug.FileStorage) file, jpeg or raw frame
+    :return: (np.array) image
+    """
+    return decode_frame(file.read(), file.mimetype or JPEG_CONTENT_TYPE)
+
+
+def read_locations(request):
+    """Read the face locations already detected by the client, if any.
+
+    They are sent as json in the locations query argument, or in the legacy json body.
+
+    :param request: (flask.Request) request
+    :return: (list) face locations or None
+    """
+    if "locations" in request.args:
+        return json.loads(request.args["locations"])
+    if request.mimetype == "application/json":
+        return json.loads(request.get_data()).get("locations")
+
+    return None
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Production entry point of the webservice.
+
+Run a single worker process: it owns the serial gps, the cameras and the disk caches, which
+can't be opened by several processes, and shares its models between its threads, ex:
+gunicorn --workers 1 --threads 8 --bind 127.0.0.1:5000 src.webservice.wsgi:application
+or, with waitress: python src/webservice/server.py --production
+"""
+from src import settings
+from src.webservice.lazy import warm_up
+from src.webservice.server import app as application
+
+if settings.WARM_UP_ON_START:
+    warm_up(background=True)